@@ -0,0 +1,84 @@
+"""
+Заглушка Telegram Bot API на aiohttp для нагрузочных тестов.
+Отвечает на методы, которые вызывает бот, и запоминает отправленные сообщения.
+"""
+import asyncio
+import json
+import re
+import time
+from collections import defaultdict
+
+from aiohttp import web
+
+FAKE_PHOTO = b'\xff\xd8\xff\xe0' + b'\x00' * 40 * 1024 + b'\xff\xd9'
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.message_id = 0
+        self.calls: dict[str, int] = defaultdict(int)
+        # chat_id -> [(message_id, текст или подпись)]
+        self.sent: dict[str, list[tuple[int, str]]] = defaultdict(list)
+        self.app = web.Application(client_max_size=50 * 1024 * 1024)
+        self.app.router.add_post('/bot{token}/{method}', self.handle_method)
+        self.app.router.add_get('/file/bot{token}/{path:.+}', self.handle_file)
+        self._runner: web.AppRunner | None = None
+
+    def _message(self, chat_id: str, text: str | None = None) -> dict:
+        self.message_id += 1
+        self.sent[chat_id].append((self.message_id, text or ''))
+        return {
+            'message_id': self.message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': text,
+        }
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        self.calls[method] += 1
+        data = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        chat_id = str(data.get('chat_id', 0))
+        if method in ('sendmessage', 'editmessagetext'):
+            result = self._message(chat_id, data.get('text'))
+        elif method in ('sendphoto', 'editmessagereplymarkup'):
+            result = self._message(chat_id, data.get('caption'))
+        elif method == 'sendmediagroup':
+            media = json.loads(data['media'])
+            result = [self._message(chat_id, item.get('caption')) for item in media]
+        elif method == 'getfile':
+            file_id = data.get('file_id')
+            result = {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(FAKE_PHOTO),
+                      'file_path': f'photos/{file_id}.jpg'}
+        elif method == 'getme':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'fake', 'username': 'fake_bot'}
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def handle_file(self, request: web.Request) -> web.Response:
+        self.calls['file'] += 1
+        return web.Response(body=FAKE_PHOTO, content_type='image/jpeg')
+
+    def find_order_message(self, chat_id, order_id: int) -> int | None:
+        """message_id сообщения менеджеру с заказом order_id"""
+        pattern = re.compile(rf'Номер: {order_id}\n')
+        for message_id, text in self.sent[str(chat_id)]:
+            if pattern.search(text):
+                return message_id
+        return None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
@@ -0,0 +1,76 @@
+"""
+Обработка фото: экономия байтов и пропускная способность на ядро.
+Запуск: python -m benchmarks.images [-n 40] [-w 1 2 4] [file ...]
+
+Без файлов генерируются снимки 3000x4000, похожие на фото с телефона
+(шум + градиент, EXIF-профиль). Для честной оценки лучше передать
+реальные фото товаров и чеков.
+"""
+import argparse
+import concurrent.futures
+import functools
+import os
+import statistics
+import time
+
+from wand.image import Image
+
+from config_data.bot_conf import conf
+from services.images import process_image
+
+
+def synthetic_photo(width: int = 3000, height: int = 4000) -> bytes:
+    with Image(width=width, height=height, pseudo='plasma:') as img:
+        img.noise('gaussian', attenuate=0.3)
+        img.format = 'jpeg'
+        img.compression_quality = 95
+        img.artifacts['comment'] = 'x' * 4096
+        return img.make_blob()
+
+
+def run(photos: list[bytes], workers: int, thumbnail: bool) -> tuple[float, list]:
+    process = functools.partial(process_image, max_side=conf.logic.image_max_side,
+                                quality=conf.logic.image_quality,
+                                thumb_side=conf.logic.thumb_side if thumbnail else 0)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        # Прогрев: запуск процессов и загрузка ImageMagick
+        list(pool.map(process, photos[:workers]))
+        start = time.perf_counter()
+        results = list(pool.map(process, photos))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Обработка фото в пуле процессов')
+    parser.add_argument('-n', '--count', type=int, default=40, help='Фото в прогоне')
+    parser.add_argument('-w', '--workers', type=int, nargs='*', default=[1, 2, os.cpu_count()])
+    parser.add_argument('--no-thumb', action='store_true')
+    parser.add_argument('files', nargs='*')
+    args = parser.parse_args()
+
+    if args.files:
+        sources = [open(path, 'rb').read() for path in args.files]
+    else:
+        sources = [synthetic_photo()]
+    photos = [sources[num % len(sources)] for num in range(args.count)]
+
+    print(f'{"workers":>8} {"photos/s":>10} {"per core":>10} {"ms/photo":>10}')
+    results = []
+    for workers in sorted(set(args.workers)):
+        elapsed, results = run(photos, workers, not args.no_thumb)
+        rate = len(photos) / elapsed
+        print(f'{workers:>8} {rate:>10.1f} {rate / workers:>10.1f} {elapsed / len(photos) * 1000 * workers:>10.1f}')
+
+    source_size = sum(image.source_size for image in results)
+    result_size = sum(len(image.data) for image in results)
+    thumb_size = sum(len(image.thumb or b'') for image in results)
+    print()
+    print(f'Исходные:    {source_size / len(results) / 1024:>8.1f} КБ/фото')
+    print(f'Обработанные:{result_size / len(results) / 1024:>8.1f} КБ/фото '
+          f'(-{(1 - result_size / source_size) * 100:.0f}%)')
+    print(f'Превью:      {thumb_size / len(results) / 1024:>8.1f} КБ/фото')
+    print(f'Медиана сжатия: {statistics.median(len(i.data) / i.source_size for i in results):.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Нагрузочный прогон бота: N покупателей проходят реальные роутеры
+против заглушки Bot API (benchmarks/fake_api.py).
+
+Сценарий покупателя: /start, калькулятор, оформление заказа с фото,
+корзина, заполнение профиля, чек об оплате. Затем менеджер подтверждает
+или отменяет каждый заказ ответом на сообщение.
+
+Запуск:
+    python -m benchmarks.load --users 50 --concurrency 50
+    python -m benchmarks.load --start-postgres      # поднять Postgres в docker
+    python -m benchmarks.load --json result.json
+
+База берется из .env (или DB_* переменных окружения). Пользователи прогона
+получают tg_id от --tg-id-base и удаляются после прогона, поэтому повторные
+запуски с тем же --seed дают сравнимые результаты.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон бота')
+    parser.add_argument('--users', type=int, default=20, help='Сколько покупателей')
+    parser.add_argument('--concurrency', type=int, default=20, help='Сколько покупателей одновременно')
+    parser.add_argument('--cart-size', type=int, default=1, help='Товаров в корзине у покупателя')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--think-ms', type=float, default=0, help='Средняя пауза между действиями')
+    parser.add_argument('--api-latency-ms', type=float, default=0, help='Задержка ответа заглушки Bot API')
+    parser.add_argument('--throttle', action='store_true', help='Включить OutboundLimiter')
+    parser.add_argument('--redis', action='store_true', help='FSM в Redis из .env вместо памяти')
+    parser.add_argument('--tg-id-base', type=int, default=900_000_000)
+    parser.add_argument('--start-postgres', action='store_true', help='Запустить postgres:14-alpine в docker')
+    parser.add_argument('--pg-port', type=int, default=25432)
+    parser.add_argument('--json', help='Сохранить результат в файл')
+    return parser.parse_args()
+
+
+def start_postgres(port: int) -> str:
+    name = f'poison-bench-{port}'
+    subprocess.run(['docker', 'run', '-d', '--rm', '--name', name, '-p', f'{port}:5432',
+                    '-e', 'POSTGRES_USER=bench', '-e', 'POSTGRES_PASSWORD=bench', '-e', 'POSTGRES_DB=bench',
+                    'postgres:14-alpine'], check=True, stdout=subprocess.DEVNULL)
+    for _ in range(60):
+        ready = subprocess.run(['docker', 'exec', name, 'pg_isready', '-U', 'bench', '-h', '127.0.0.1'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if ready.returncode == 0:
+            break
+        time.sleep(1)
+    os.environ.update(DB_HOST='127.0.0.1', DB_PORT=str(port), POSTGRES_USER='bench',
+                      POSTGRES_PASSWORD='bench', POSTGRES_DB='bench')
+    return name
+
+
+def configure_env(args):
+    """Переменные окружения до импорта config_data: load_dotenv их не перезаписывает"""
+    os.environ['BOT_TOKEN'] = '123456:BENCHMARK'
+    os.environ.setdefault('ADMIN_IDS', '100')
+    os.environ.setdefault('TIMEZONE', 'Europe/Moscow')
+    if not args.redis:
+        os.environ['REDIS_HOST'] = ''
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def run(args) -> dict:
+    from aiogram import Bot, BaseMiddleware
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import Update
+    from sqlalchemy import delete
+
+    from benchmarks.fake_api import FakeBotAPI
+    from database.bootstrap import migrate, seed
+    from database.db import AsyncSession, User, dispose_engines
+    from main import create_dispatcher
+    from middlewares.handler_name import handler_name
+    from services.catalog import catalog
+    from services.func import user_cache
+    from services.settings import settings_cache
+    from services.throttle import OutboundLimiter
+
+    await asyncio.to_thread(migrate)
+    await asyncio.to_thread(seed)
+
+    api = FakeBotAPI(latency=args.api_latency_ms / 1000)
+    base_url = await api.start()
+    bot = Bot(token=os.environ['BOT_TOKEN'], parse_mode='HTML',
+              session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+    if args.throttle:
+        bot.session.middleware(OutboundLimiter())
+    dp = create_dispatcher(storage=None if args.redis else MemoryStorage())
+
+    timings: dict[str, list[float]] = defaultdict(list)
+
+    class HandlerTimer(BaseMiddleware):
+        async def __call__(self, handler: Callable[..., Awaitable], event: Any, data: dict) -> Any:
+            label = '.'.join(handler_name(data))
+            start = time.perf_counter()
+            try:
+                return await handler(event, data)
+            finally:
+                timings[label].append((time.perf_counter() - start) * 1000)
+
+    dp.message.middleware(HandlerTimer())
+    dp.callback_query.middleware(HandlerTimer())
+
+    rnd = random.Random(args.seed)
+    manager_chat = int(await settings_cache.get('manager_id'))
+    await catalog.item_menu()
+    item_ids = list(catalog.items)
+    counter = {'update_id': 0, 'message_id': 10 ** 9}
+
+    def chat(chat_id: int) -> dict:
+        return {'id': chat_id, 'type': 'private'}
+
+    def person(user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}', 'username': f'user{user_id}'}
+
+    def message(user_id: int, chat_id: int | None = None, **fields) -> dict:
+        counter['message_id'] += 1
+        return {'message_id': counter['message_id'], 'date': int(time.time()),
+                'chat': chat(chat_id or user_id), 'from': person(user_id), **fields}
+
+    def photo(tag: str) -> list[dict]:
+        return [{'file_id': f'photo-{tag}', 'file_unique_id': f'u-{tag}', 'width': 1280, 'height': 1280}]
+
+    async def feed(**payload):
+        counter['update_id'] += 1
+        update = Update.model_validate({'update_id': counter['update_id'], **payload}, context={'bot': bot})
+        await dp.feed_update(bot, update)
+        if args.think_ms:
+            await asyncio.sleep(rnd.expovariate(1 / args.think_ms) / 1000)
+
+    async def send_text(user_id: int, text: str):
+        await feed(message=message(user_id, text=text))
+
+    async def press(user_id: int, data: str):
+        await feed(callback_query={'id': str(counter['update_id']), 'from': person(user_id),
+                                   'chat_instance': 'bench', 'data': data,
+                                   'message': message(1, chat_id=user_id, text='menu')})
+
+    async def shopper(num: int, rnd_user: random.Random):
+        user_id = args.tg_id_base + num
+        await send_text(user_id, '/start')
+        await press(user_id, 'calc')
+        await press(user_id, f'item_{rnd_user.choice(item_ids)}')
+        await send_text(user_id, str(rnd_user.randint(50, 5000)))
+        for position in range(args.cart_size):
+            await press(user_id, 'order')
+            await press(user_id, f'item_{rnd_user.choice(item_ids)}')
+            await feed(message=message(user_id, photo=photo(f'{user_id}-{position}')))
+            await send_text(user_id, f'https://example.com/item/{user_id}/{position}')
+            await send_text(user_id, rnd_user.choice(['42', 'M', 'нет']))
+            await send_text(user_id, str(rnd_user.randint(50, 5000)))
+            await press(user_id, 'order_confirm')
+        await press(user_id, 'cart')
+        await press(user_id, 'pay_confirm')
+        await send_text(user_id, f'Иванов {num}')
+        await send_text(user_id, '+70000000000')
+        await send_text(user_id, f'Москва, {num}')
+        cart_text = api.sent[str(user_id)][-1][1]
+        order_ids = [int(order_id) for order_id in re.findall(r'Номер: (\d+)\n', cart_text)]
+        await press(user_id, 'pay_confirm')
+        await feed(message=message(user_id, photo=photo(f'{user_id}-pay')))
+        # Ответы менеджера: свой from_user, чтобы FSM отмены не пересекались
+        manager_user = args.tg_id_base * 2 + num
+        for order_id in order_ids:
+            manager_msg_id = api.find_order_message(manager_chat, order_id)
+            if manager_msg_id is None:
+                continue
+            reply_to = {'message_id': manager_msg_id, 'date': int(time.time()), 'chat': chat(manager_chat)}
+            if rnd_user.random() < 0.5:
+                await feed(message=message(manager_user, chat_id=manager_chat, photo=photo(f'buy-{order_id}'),
+                                           caption=f'подтвердить {order_id}', reply_to_message=reply_to))
+            else:
+                await feed(message=message(manager_user, chat_id=manager_chat, text=f'отменить {order_id}',
+                                           reply_to_message=reply_to))
+                await feed(message=message(manager_user, chat_id=manager_chat, text='нет в наличии'))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # Свой генератор на покупателя: результат не зависит от порядка планирования
+    user_seeds = [rnd.random() for _ in range(args.users)]
+
+    async def limited(num: int):
+        async with semaphore:
+            await shopper(num, random.Random(user_seeds[num]))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(limited(num) for num in range(args.users)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    errors = [repr(res) for res in results if isinstance(res, Exception)]
+
+    async with AsyncSession() as session:
+        await session.execute(delete(User).where(User.tg_id.in_(
+            [str(args.tg_id_base + num) for num in range(args.users)])))
+        await session.commit()
+    user_cache.clear()
+    await bot.session.close()
+    await dp.storage.close()
+    await api.stop()
+    await dispose_engines()
+
+    handlers = {}
+    for label, values in sorted(timings.items()):
+        handlers[label] = {
+            'count': len(values),
+            'mean_ms': statistics.fmean(values),
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+        }
+    total_updates = counter['update_id']
+    return {
+        'config': {key: val for key, val in vars(args).items() if key != 'json'},
+        'elapsed_s': elapsed,
+        'updates': total_updates,
+        'updates_per_s': total_updates / elapsed if elapsed else 0,
+        'api_calls': dict(api.calls),
+        'errors': errors,
+        'handlers': handlers,
+    }
+
+
+def print_report(result: dict):
+    print(f'config: {result["config"]}')
+    print(f'updates: {result["updates"]} за {result["elapsed_s"]:.2f} с, '
+          f'{result["updates_per_s"]:.1f} апдейтов/с, ошибок: {len(result["errors"])}')
+    print(f'{"handler":<45} {"count":>6} {"p50":>8} {"p95":>8} {"p99":>8}')
+    for label, stat in result['handlers'].items():
+        print(f'{label:<45} {stat["count"]:>6} {stat["p50_ms"]:>8.1f} {stat["p95_ms"]:>8.1f} {stat["p99_ms"]:>8.1f}')
+    for err in result['errors'][:5]:
+        print(err)
+
+
+def main():
+    args = parse_args()
+    container = start_postgres(args.pg_port) if args.start_postgres else None
+    configure_env(args)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if container:
+            subprocess.run(['docker', 'stop', container], stdout=subprocess.DEVNULL)
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+    sys.exit(1 if result['errors'] else 0)
+
+
+if __name__ == '__main__':
+    main()
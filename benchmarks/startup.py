@@ -0,0 +1,49 @@
+"""
+Время импорта модулей бота в чистом процессе.
+Запуск: python -m benchmarks.startup [-n 20] [module ...]
+    или python benchmarks/startup.py [-n 20] [module ...]
+
+Сравнение: запустить на двух коммитах с одинаковым .env.
+Импорт не должен обращаться к базе: после выноса создания схемы и
+начальных данных в database.bootstrap время не зависит от доступности Postgres.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Без импорта config_data: скрипт запускается и как python benchmarks/startup.py
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ['database.db', 'services.func', 'handlers.orders', 'main']
+
+
+def measure(module: str, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import {module}'], cwd=BASE_DIR, check=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Время импорта модулей бота')
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    args = parser.parse_args()
+    # Запуск самого интерпретатора, для сравнения
+    baseline = statistics.median(measure('sys', args.runs))
+    print(f'{"module":<20} {"median, ms":>12} {"min, ms":>10} {"p95, ms":>10}')
+    print(f'{"(python)":<20} {baseline:>12.1f}')
+    for module in args.modules:
+        timings = sorted(measure(module, args.runs))
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f'{module:<20} {statistics.median(timings):>12.1f} {timings[0]:>10.1f} {p95:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
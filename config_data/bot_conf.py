@@ -21,30 +21,33 @@ LOGGING_CONFIG = {
             # 'format': "%(asctime)s - [%(levelname)8s] - %(name)s - (%(filename)s).%(funcName)s(%(lineno)d) - %(message)s"
             'format': "%(asctime)s - %(levelname)s - %(funcName)s: %(lineno)d - %(message)s"
         },
+        'json_formatter': {
+            '()': 'config_data.log_conf.JsonFormatter',
+        },
     },
 
     'handlers': {
         'stream_handler': {
             'class': 'logging.StreamHandler',
-            'formatter': 'default_formatter',
+            'formatter': 'json_formatter',
         },
         'rotating_file_handler': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'config_data.log_conf.GzipRotatingFileHandler',
             'filename': f'{BASE_DIR / "logs" / "bot"}.log',
             'backupCount': 2,
             'maxBytes': 10 * 1024 * 1024,
             'mode': 'a',
             'encoding': 'UTF-8',
-            'formatter': 'default_formatter',
+            'formatter': 'json_formatter',
         },
         'errors_file_handler': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'config_data.log_conf.GzipRotatingFileHandler',
             'filename': f'{BASE_DIR / "logs" / "errors_bot"}.log',
             'backupCount': 2,
             'maxBytes': 10 * 1024 * 1024,
             'mode': 'a',
             'encoding': 'UTF-8',
-            'formatter': 'default_formatter',
+            'formatter': 'json_formatter',
         },
     },
     'loggers': {
@@ -87,9 +90,32 @@ class TgBot:
     TIMEZONE: pytz.timezone
 
 
+@dataclass
+class WebhookConfig:
+    mode: str  # polling или webhook
+    url: str  # Публичный адрес, на который телеграм шлет апдейты
+    path: str  # Путь обработчика в aiohttp
+    secret: str  # X-Telegram-Bot-Api-Secret-Token
+    host: str  # Адрес, который слушает aiohttp
+    port: int
+    workers: int = 1  # Число процессов бота, больше одного только в режиме webhook и с Redis
+
+
 @dataclass
 class Logic:
-    pass
+    settings_ttl: int = 60  # Время жизни кэша настроек бота, сек
+    currency_url: str = 'https://www.cbr-xml-daily.ru/daily_json.js'  # Источник курса CNY
+    media_mode: str = 'file_id'  # file_id - фото по ссылке телеграма, blob - еще и копия в blobs
+    user_cache_size: int = 10000  # Сколько User держать в LRU-кэше процесса
+    metrics_port: int = 9100  # Порт /metrics в режиме polling, 0 - выключено
+    slow_query_ms: int = 200  # Запросы дольше логируются с параметрами
+    query_budget: int = 10  # Больше запросов на апдейт - предупреждение в лог
+    image_workers: int = 2  # Процессов для обработки фото в режиме blob
+    image_max_side: int = 1600  # Большая сторона фото после обработки, px
+    image_quality: int = 82  # Качество JPEG
+    thumb_side: int = 320  # Большая сторона превью для менеджера, px
+    archive_after_days: int = 90  # Через сколько дней завершенный заказ уходит в orders_archive
+    archive_batch: int = 1000  # Заказов за одну транзакцию архивации
 
 
 @dataclass
@@ -98,6 +124,7 @@ class Config:
     db: PostgresConfig
     logic: Logic
     redis_db: RedisConfig
+    webhook: WebhookConfig
 
 
 def load_config(path=None) -> Config:
@@ -118,7 +145,30 @@ def load_config(path=None) -> Config:
                       REDIS_PORT=os.getenv('REDIS_PORT'),
                       REDIS_PASSWORD=os.getenv('REDIS_PASSWORD'),
                   ),
-                  logic=Logic(),
+                  webhook=WebhookConfig(
+                      mode=os.getenv('BOT_MODE', 'polling'),
+                      url=os.getenv('WEBHOOK_URL', ''),
+                      path=os.getenv('WEBHOOK_PATH', '/webhook'),
+                      secret=os.getenv('WEBHOOK_SECRET', ''),
+                      host=os.getenv('WEBAPP_HOST', '0.0.0.0'),
+                      port=int(os.getenv('WEBAPP_PORT', 8080)),
+                      workers=int(os.getenv('WEB_WORKERS', 1)),
+                  ),
+                  logic=Logic(
+                      settings_ttl=int(os.getenv('SETTINGS_TTL', 60)),
+                      currency_url=os.getenv('CURRENCY_URL', 'https://www.cbr-xml-daily.ru/daily_json.js'),
+                      media_mode=os.getenv('MEDIA_MODE', 'file_id'),
+                      user_cache_size=int(os.getenv('USER_CACHE_SIZE', 10000)),
+                      metrics_port=int(os.getenv('METRICS_PORT', 9100)),
+                      slow_query_ms=int(os.getenv('SLOW_QUERY_MS', 200)),
+                      query_budget=int(os.getenv('QUERY_BUDGET', 10)),
+                      image_workers=int(os.getenv('IMAGE_WORKERS', 2)),
+                      image_max_side=int(os.getenv('IMAGE_MAX_SIDE', 1600)),
+                      image_quality=int(os.getenv('IMAGE_QUALITY', 82)),
+                      thumb_side=int(os.getenv('THUMB_SIDE', 320)),
+                      archive_after_days=int(os.getenv('ARCHIVE_AFTER_DAYS', 90)),
+                      archive_batch=int(os.getenv('ARCHIVE_BATCH', 1000)),
+                  ),
                   )
 
 
@@ -126,10 +176,19 @@ load_dotenv()
 
 conf = load_config()
 tz = conf.tg_bot.TIMEZONE
-print(conf)
+
+_logging_configured = False
 
 
 def get_my_loggers():
-    import logging.config
-    logging.config.dictConfig(LOGGING_CONFIG)
+    """
+    Логгеры бота. Настраиваются один раз на процесс:
+    уровни из LOG_LEVEL/LOG_LEVELS, запись через очередь (config_data/log_conf.py)
+    """
+    global _logging_configured
+    import logging
+    from config_data.log_conf import setup_logging
+    if not _logging_configured:
+        setup_logging(LOGGING_CONFIG)
+        _logging_configured = True
     return logging.getLogger('bot_logger'), logging.getLogger('errors_logger')
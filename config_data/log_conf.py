@@ -0,0 +1,145 @@
+"""
+Логирование без блокировки event loop.
+Логгеры пишут в очередь (QueueHandler), файлы и консоль обслуживает
+QueueListener в отдельном потоке. Записи - JSON с update_id, user_id и хендлером.
+"""
+import atexit
+import copy
+import datetime
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Заполняются middleware для текущего апдейта
+log_update_id: ContextVar[int | None] = ContextVar('log_update_id', default=None)
+log_user_id: ContextVar[int | None] = ContextVar('log_user_id', default=None)
+log_handler: ContextVar[str | None] = ContextVar('log_handler', default=None)
+
+_listeners: list[QueueListener] = []
+
+
+class ContextFilter(logging.Filter):
+    """Переносит contextvars апдейта в запись, пока она еще в потоке loop"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.update_id = log_update_id.get()
+        record.user_id = log_user_id.get()
+        record.handler = log_handler.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю rate DEBUG-записей, остальные уровни - все"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'func': record.funcName,
+            'line': record.lineno,
+            'message': record.getMessage(),
+        }
+        for key in ('update_id', 'user_id', 'handler'):
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в потоке loop.
+    Стандартный prepare() форматирует запись и обнуляет exc_info,
+    здесь подставляются только аргументы сообщения, а traceback
+    форматирует обработчик в потоке QueueListener
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class GzipRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler, который сжимает ротированные файлы в .gz"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = lambda name: f'{name}.gz'
+        self.rotator = self._gzip_rotator
+
+    @staticmethod
+    def _gzip_rotator(source: str, dest: str):
+        with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+def parse_levels(raw: str) -> dict[str, str]:
+    """'bot_logger=INFO,aiogram=WARNING' -> {'bot_logger': 'INFO', 'aiogram': 'WARNING'}"""
+    levels = {}
+    for part in filter(None, (chunk.strip() for chunk in raw.split(','))):
+        name, _, level = part.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def move_to_queue(logger: logging.Logger, debug_sample: float):
+    """Заменяет обработчики логгера на QueueHandler, сами обработчики - в QueueListener"""
+    handlers = logger.handlers[:]
+    if not handlers:
+        return
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(debug_sample))
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+
+def stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def setup_logging(config: dict):
+    import logging.config
+    logging.config.dictConfig(config)
+    default_level = os.getenv('LOG_LEVEL')
+    levels = parse_levels(os.getenv('LOG_LEVELS', ''))
+    debug_sample = float(os.getenv('LOG_DEBUG_SAMPLE', 1))
+    for name in config['loggers']:
+        logger = logging.getLogger(name)
+        level = levels.pop(name, default_level)
+        if level:
+            logger.setLevel(level)
+        move_to_queue(logger, debug_sample)
+    # Уровни для сторонних логгеров (aiogram, sqlalchemy.engine, ...)
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    atexit.register(stop_listeners)
@@ -0,0 +1,91 @@
+"""
+Подготовка базы: создание, миграции, начальные данные.
+Запускается отдельно перед ботом:
+    python -m database.bootstrap           # всё
+    python -m database.bootstrap migrate   # только миграции
+    python -m database.bootstrap seed      # только начальные данные
+"""
+import argparse
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy_utils.functions import database_exists, create_database
+
+from config_data.bot_conf import conf, get_my_loggers, BASE_DIR
+from database.db import get_engine, db_url, Faq, Item, BotSettings
+
+logger, err_log = get_my_loggers()
+
+faq_start = [
+    ['Вопрос 1', 'Ответ 1'],
+    ['Вопрос 2', 'Ответ 2'],
+]
+
+items_start = [
+    ['Кроссовки', 1390],
+    ['Ботинки', 1690],
+    ['Футболки, шорты, аксессуары, парфюм', 590],
+    ['Куртки', 1380],
+    ['Джинсы, брюки, толстовки', 790],
+    ['Рюкзаки, сумки', 990],
+    ['Телефоны', 1690],
+]
+
+settings_start = [
+    ['tax1', 99, 'Первая комиссия'],
+    ['tax2', 249, 'Обычная комиссия'],
+    ['manager_id', conf.tg_bot.admin_ids[0], 'id менеджера'],
+    ['pay_req', 'Реквизиты для оплаты', 'Реквизиты для оплаты'],
+    ['cny_currency', 12.69],
+    ['currency_last_update', '2023-04-01 08:03:26'],
+]
+
+
+def migrate():
+    """
+    Приводит схему к последней миграции alembic.
+    Базу, созданную раньше через create_all, сначала помечает ревизией 0001
+    """
+    if not database_exists(db_url):
+        create_database(db_url)
+    alembic_cfg = Config(str(BASE_DIR / 'alembic.ini'))
+    with get_engine().connect() as conn:
+        db_inspect = inspect(conn)
+        if db_inspect.has_table('users') and not db_inspect.has_table('alembic_version'):
+            command.stamp(alembic_cfg, '0001')
+    command.upgrade(alembic_cfg, 'head')
+    logger.info('Миграции применены')
+
+
+def seed():
+    """Начальные данные одной транзакцией"""
+    with Session(get_engine()) as session:
+        if not session.scalar(select(func.count()).select_from(Faq)):
+            session.add_all([Faq(question=question, answer=answer) for question, answer in faq_start])
+        if not session.scalar(select(func.count()).select_from(Item)):
+            session.add_all([Item(name=name, shipping=shipping) for name, shipping in items_start])
+        # Недостающие настройки добавляются и в существующую базу
+        q = insert(BotSettings).values([
+            {'name': setting[0], 'value': str(setting[1]), 'description': setting[2] if len(setting) > 2 else ''}
+            for setting in settings_start
+        ]).on_conflict_do_nothing(index_elements=['name'])
+        session.execute(q)
+        session.commit()
+    logger.info('Начальные данные загружены')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Подготовка базы бота')
+    parser.add_argument('action', nargs='?', default='all', choices=['all', 'migrate', 'seed'])
+    args = parser.parse_args()
+    if args.action in ('all', 'migrate'):
+        migrate()
+    if args.action in ('all', 'seed'):
+        seed()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,66 @@
-import asyncio
 import datetime
-import sys
+import functools
 
-
-from sqlalchemy import create_engine, ForeignKey, Date, String, DateTime, \
-    Float, UniqueConstraint, Integer, LargeBinary, BLOB, select
+from sqlalchemy import create_engine, ForeignKey, String, DateTime, \
+    Float, UniqueConstraint, Integer, LargeBinary, Index, Engine
 from sqlalchemy.orm import DeclarativeBase, relationship
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy_utils.functions import database_exists, create_database
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 
 from config_data.bot_conf import conf, get_my_loggers
+from database.query_stats import install_query_hooks
 
 logger, err_log = get_my_loggers()
 
 db_url = f"postgresql+psycopg2://{conf.db.db_user}:{conf.db.db_password}@{conf.db.db_host}:{conf.db.db_port}/{conf.db.database}"
-engine = create_engine(db_url, echo=False)
-Session = sessionmaker(bind=engine)
+async_db_url = f"postgresql+asyncpg://{conf.db.db_user}:{conf.db.db_password}@{conf.db.db_host}:{conf.db.db_port}/{conf.db.database}"
+
+
+@functools.cache
+def get_engine() -> Engine:
+    """Синхронный движок: миграции и служебные скрипты"""
+    engine = create_engine(db_url, echo=False)
+    install_query_hooks(engine)
+    return engine
+
+
+@functools.cache
+def get_async_engine() -> AsyncEngine:
+    """Асинхронный движок для хендлеров, создается при первом обращении"""
+    engine = create_async_engine(async_db_url, echo=False, pool_size=10, max_overflow=20, pool_pre_ping=True)
+    install_query_hooks(engine.sync_engine)
+    return engine
+
+
+@functools.cache
+def get_lock_engine() -> AsyncEngine:
+    """
+    Отдельный пул для advisory lock: соединение держится всю критическую секцию,
+    и ожидающие блокировку не должны занимать пул хендлеров
+    """
+    return create_async_engine(async_db_url, echo=False, pool_size=5, max_overflow=5, pool_pre_ping=True)
+
+
+async def dispose_engines():
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_lock_engine.cache_info().currsize:
+        await get_lock_engine().dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
+
+class LazyAsyncSessionMaker(async_sessionmaker):
+    """Привязывает движок при первом открытии сессии, а не при импорте"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get('bind') is None:
+            self.configure(bind=get_async_engine())
+        return super().__call__(**local_kw)
+
+
+AsyncSession = LazyAsyncSessionMaker(expire_on_commit=False)
 
 
 class Base(DeclarativeBase):
@@ -26,6 +69,9 @@ class Base(DeclarativeBase):
 
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        UniqueConstraint('tg_id', name='uq_users_tg_id'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True,
                                     autoincrement=True)
     tg_id: Mapped[str] = mapped_column(String(30))
@@ -56,31 +102,33 @@ class Item(Base):
     def __repr__(self):
         return f'{self.__class__.__name__}({self.name}, {self.shipping})'
 
-    @staticmethod
-    def menu_btn():
-        _session = Session()
-        q = select(Item)
-        _items = session.execute(q).scalars().all()
-        _buttons = {}
-        for _item in _items:
-            _buttons[f'{_item.name} (Доставка {_item.shipping})'] = f'item_{_item.id}'
-        return _buttons
 
+class Blob(Base):
+    """Бинарные данные (фото, чеки) по sha256 содержимого"""
+    __tablename__ = 'blobs'
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary())
+    size: Mapped[int] = mapped_column(Integer())
 
-class Order(Base):
-    __tablename__ = 'orders'
-    id: Mapped[int] = mapped_column(primary_key=True,
-                                    autoincrement=True)
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.key[:12]}, {self.size})'
+
+
+class OrderColumns:
+    """Общие колонки заказов: рабочая таблица и архив"""
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
-    user: Mapped["User"] = relationship(lazy='joined')
     item_id:  Mapped[int] = mapped_column(ForeignKey('items.id', ondelete='SET NULL'))
-    item: Mapped["Item"] = relationship()
     status: Mapped[str] = mapped_column(String(20), default='temp')
-    photo: Mapped[str] = mapped_column(LargeBinary())
+    photo_key: Mapped[str] = mapped_column(ForeignKey('blobs.key'), nullable=True)
+    photo_thumb_key: Mapped[str] = mapped_column(ForeignKey('blobs.key'), nullable=True)
+    photo_file_id: Mapped[str] = mapped_column(String(200), nullable=True)
+    photo_file_unique_id: Mapped[str] = mapped_column(String(100), nullable=True)
     link: Mapped[str] = mapped_column(String(200))
     size: Mapped[str] = mapped_column(String(50))
     cost: Mapped[float] = mapped_column(Float(precision=2))
-    pay_confirm: Mapped[str] = mapped_column(LargeBinary(), nullable=True)
+    pay_confirm_key: Mapped[str] = mapped_column(ForeignKey('blobs.key'), nullable=True)
+    pay_confirm_file_id: Mapped[str] = mapped_column(String(200), nullable=True)
+    pay_confirm_file_unique_id: Mapped[str] = mapped_column(String(100), nullable=True)
     pay_date: Mapped[datetime.datetime] = mapped_column(DateTime(), nullable=True)
     manager_msg_id: Mapped[int] = mapped_column(Integer(), nullable=True)
 
@@ -90,28 +138,63 @@ class Order(Base):
     def __repr__(self):
         return f'{self.__class__.__name__}({self.id}, {self.item_id} {self.status})'
 
-    def save(self):
+
+class Order(OrderColumns, Base):
+    """
+    Рабочие заказы, партиции по месяцу created.
+    Ключ партиционирования входит в первичный ключ
+    """
+    __tablename__ = 'orders'
+    __table_args__ = (
+        Index('ix_orders_user_id_status', 'user_id', 'status'),
+        Index('ix_orders_manager_msg_id', 'manager_msg_id'),
+        Index('ix_orders_status_created', 'status', 'created'),
+        {'postgresql_partition_by': 'RANGE (created)'},
+    )
+    id: Mapped[int] = mapped_column(primary_key=True,
+                                    autoincrement=True)
+    created: Mapped[datetime.datetime] = mapped_column(DateTime(), primary_key=True,
+                                                       default=datetime.datetime.now)
+    user: Mapped["User"] = relationship(lazy='joined')
+    item: Mapped["Item"] = relationship(lazy='joined')
+
+    async def save(self):
         try:
-            _session = Session()
-            with _session:
+            async with AsyncSession() as _session:
                 order = Order(
                     user_id=self.user_id,
                     item_id=self.item_id,
-                    photo=self.photo,
+                    photo_key=self.photo_key,
+                    photo_thumb_key=self.photo_thumb_key,
+                    photo_file_id=self.photo_file_id,
+                    photo_file_unique_id=self.photo_file_unique_id,
                     link=self.link,
                     size=self.size,
                     cost=self.cost,
                 )
-                print(order)
                 _session.add(order)
-                _session.commit()
+                await _session.commit()
                 logger.debug('Сохранено')
         except Exception as err:
             logger.error(f'{err}')
 
 
+class OrderArchive(OrderColumns, Base):
+    """Завершенные заказы старше ARCHIVE_AFTER_DAYS, переносятся из orders фоновой задачей"""
+    __tablename__ = 'orders_archive'
+    id: Mapped[int] = mapped_column(primary_key=True,
+                                    autoincrement=False)
+    created: Mapped[datetime.datetime] = mapped_column(DateTime())
+    archived: Mapped[datetime.datetime] = mapped_column(DateTime(), default=datetime.datetime.now)
+    user: Mapped["User"] = relationship(lazy='joined')
+    item: Mapped["Item"] = relationship(lazy='joined')
+
+
 class BotSettings(Base):
     __tablename__ = 'bot_settings'
+    __table_args__ = (
+        UniqueConstraint('name', name='uq_bot_settings_name'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True,
                                     autoincrement=True)
     name: Mapped[str] = mapped_column(String(50))
@@ -121,83 +204,16 @@ class BotSettings(Base):
                                              default='')
 
 
+class JobRun(Base):
+    """Время последнего успешного запуска фоновых задач планировщика"""
+    __tablename__ = 'job_runs'
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    last_run: Mapped[datetime.datetime] = mapped_column(DateTime())
+
+
 class Faq(Base):
     __tablename__ = 'faq'
     id: Mapped[int] = mapped_column(primary_key=True,
                                     autoincrement=True)
     question: Mapped[str] = mapped_column(String(50))
     answer: Mapped[str] = mapped_column(String(2000))
-
-    @staticmethod
-    def menu_btn():
-        _session = Session()
-        q = select(Faq)
-        _items = session.execute(q).scalars().all()
-        _buttons = {}
-        for _item in _items:
-            _buttons[f'{_item.question}'] = f'answer_{_item.id}'
-        _buttons['Назад'] = 'menu'
-        return _buttons
-
-
-if not database_exists(db_url):
-    create_database(db_url)
-Base.metadata.create_all(engine)
-
-faq_start = [
-    ['Вопрос 1', 'Ответ 1'],
-    ['Вопрос 2', 'Ответ 2'],
-    ]
-
-session = Session()
-with session:
-    faqs = session.query(Faq).all()
-    if not faqs:
-        for item in faq_start:
-            faq = Faq(
-                question=item[0],
-                answer=item[1],
-            )
-            session.add(faq)
-            session.commit()
-
-items_start = [
-    ['Кроссовки', 1390],
-    ['Ботинки', 1690],
-    ['Футболки, шорты, аксессуары, парфюм', 590],
-    ['Куртки', 1380],
-    ['Джинсы, брюки, толстовки', 790],
-    ['Рюкзаки, сумки', 990],
-    ['Телефоны', 1690],
-]
-
-session = Session()
-with session:
-    items = session.query(Item).all()
-    if not items:
-        for item in items_start:
-            item = Item(
-                name=item[0],
-                shipping=item[1],
-            )
-            session.add(item)
-            session.commit()
-
-settings_start = [
-    ['tax1', 99, 'Первая комиссия'],
-    ['tax2', 249, 'Обычная комиссия'],
-    ['manager_id', conf.tg_bot.admin_ids[0], 'id менеджера'],
-    ['pay_req', 'Реквизиты для оплаты', 'Реквизиты для оплаты'],
-    ['cny_currency', 12.69],
-    ['currency_last_update', '2023-04-01 08:03:26'],
-]
-with session:
-    settings = session.query(BotSettings).all()
-    if not settings:
-        for setting in settings_start:
-            options = BotSettings(
-                name=setting[0],
-                value=setting[1],
-            )
-            session.add(options)
-            session.commit()
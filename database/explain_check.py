@@ -0,0 +1,62 @@
+"""
+Проверка, что горячие запросы идут по индексам.
+Запуск: python -m database.explain_check
+"""
+import json
+import sys
+
+from sqlalchemy import select, text
+
+from database.db import get_engine, User, Order, BotSettings
+
+# Запрос и таблица, которую он должен читать по индексу
+HOT_QUERIES = {
+    'user_by_tg_id': (select(User).where(User.tg_id == '1'), 'users'),
+    'cart': (select(Order.id).where(Order.user_id == 1).where(Order.status == 'temp'), 'orders'),
+    'manager_reply': (select(Order.id).where(Order.manager_msg_id == 1), 'orders'),
+    'bot_settings': (select(BotSettings).where(BotSettings.name == 'tax1'), 'bot_settings'),
+}
+
+
+def scans(plan: dict):
+    """Все узлы плана, читающие таблицы"""
+    if 'Relation Name' in plan:
+        yield plan['Relation Name'], plan['Node Type']
+    for child in plan.get('Plans', []):
+        yield from scans(child)
+
+
+# Партиция -> родительская таблица: план читает orders_2023_11, а не orders
+PARENTS_SQL = text("""
+    SELECT child.relname, parent.relname FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+""")
+
+
+def check() -> dict[str, list]:
+    """Возвращает {запрос: [(таблица, тип узла)]} для узлов без индекса"""
+    problems = {}
+    engine = get_engine()
+    with engine.connect() as conn:
+        # На маленьких таблицах планировщик всегда выберет Seq Scan
+        conn.execute(text('SET enable_seqscan = off'))
+        parents = dict(conn.execute(PARENTS_SQL).all())
+        for name, (query, table) in HOT_QUERIES.items():
+            sql = str(query.compile(engine, compile_kwargs={'literal_binds': True}))
+            raw_plan = conn.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+            plan = (raw_plan if isinstance(raw_plan, list) else json.loads(raw_plan))[0]['Plan']
+            # Bitmap Heap Scan читает строки по Bitmap Index Scan - это тоже индекс
+            bad = [(rel, node) for rel, node in scans(plan)
+                   if parents.get(rel, rel) == table and node == 'Seq Scan']
+            if bad:
+                problems[name] = bad
+    return problems
+
+
+if __name__ == '__main__':
+    result = check()
+    for name, bad in result.items():
+        print(f'{name}: {bad}')
+    print('OK' if not result else 'Есть запросы без индекса')
+    sys.exit(1 if result else 0)
@@ -0,0 +1,78 @@
+"""
+Учет SQL-запросов по апдейтам.
+Хуки движка пишут каждый запрос в QueryStats из contextvar текущего апдейта,
+медленные запросы логируются с параметрами и хендлером.
+"""
+import contextlib
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, Engine
+
+from config_data.bot_conf import conf, get_my_loggers
+
+logger, err_log = get_my_loggers()
+
+
+@dataclass
+class QueryStats:
+    update_id: int | None = None
+    handler: str | None = None
+    count: int = 0
+    duration: float = 0.0
+    statements: list[tuple[str, float]] = field(default_factory=list)
+
+    def add(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements.append((statement, duration))
+
+
+current_stats: ContextVar[QueryStats | None] = ContextVar('current_stats', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add(statement, duration)
+    if duration * 1000 >= conf.logic.slow_query_ms:
+        handler = stats.handler if stats else None
+        logger.warning(f'Медленный запрос {duration * 1000:.0f} мс, хендлер {handler}: {statement} {parameters!r}')
+
+
+def install_query_hooks(engine: Engine):
+    """Подключает учет к движку. Для AsyncEngine передается engine.sync_engine"""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextlib.contextmanager
+def count_queries(update_id: int | None = None):
+    """Собирает запросы внутри блока в новый QueryStats"""
+    stats = QueryStats(update_id=update_id)
+    token = current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_stats.reset(token)
+
+
+@contextlib.contextmanager
+def assert_max_queries(limit: int):
+    """
+    Для тестов: падает, если блок сделал больше limit запросов.
+        with assert_max_queries(2):
+            await get_bucket_text(user)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        statements = '\n'.join(f'{duration * 1000:.1f} ms: {statement}' for statement, duration in stats.statements)
+        raise AssertionError(f'{stats.count} запросов при лимите {limit}:\n{statements}')
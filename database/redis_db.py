@@ -0,0 +1,15 @@
+from redis.asyncio import Redis
+
+from config_data.bot_conf import conf
+
+
+def create_redis() -> Redis:
+    return Redis(
+        host=conf.redis_db.REDIS_HOST,
+        port=int(conf.redis_db.REDIS_PORT or 6379),
+        db=int(conf.redis_db.REDIS_DB_NUM or 0),
+        password=conf.redis_db.REDIS_PASSWORD or None,
+    )
+
+
+redis = create_redis() if conf.redis_db.REDIS_HOST else None
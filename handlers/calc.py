@@ -13,12 +13,14 @@ from config_data.bot_conf import get_my_loggers
 from database.db import User, Item, Order
 from handlers.user_handlers import FSMUser
 from keyboards.keyboards import start_kb, custom_kb, cart_kb
-from services.func import get_or_create_user, get_order_confirm_text, get_bucket_text, get_cart_delete_kb_btn, \
+from services.catalog import catalog
+from services.func import get_or_create_user, get_order_confirm_text, \
     delete_order, update_pay_confirm, update_user, send_orders_to_manager, get_item, calc_cost
+from services.pricing import parse_price
 
 logger, err_log = get_my_loggers()
 
-router: Router = Router()
+router: Router = Router(name='calc')
 
 
 class FSMCalc(StatesGroup):
@@ -30,20 +32,18 @@ class FSMCalc(StatesGroup):
 async def order_start(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.message.delete()
-    btn = Item().menu_btn()
     await state.set_state(FSMCalc.selected)
     text = '\n\nВыберите тип товара:'
-    await callback.message.answer(text, reply_markup=custom_kb(1, btn))
+    await callback.message.answer(text, reply_markup=await catalog.item_menu())
 
 
 @router.callback_query(F.data == 'calc_again')
 async def order_start(callback: CallbackQuery, state: FSMContext):
     await state.clear()
     await callback.message.delete_reply_markup()
-    btn = Item().menu_btn()
     await state.set_state(FSMCalc.selected)
     text = '\n\nВыберите тип товара:'
-    await callback.message.answer(text, reply_markup=custom_kb(1, btn))
+    await callback.message.answer(text, reply_markup=await catalog.item_menu())
 
 
 @router.callback_query(F.data.startswith('item_'), StateFilter(FSMCalc.selected))
@@ -60,10 +60,10 @@ async def order_cost(message: Message, state: FSMContext, bot: Bot):
     try:
         data = await state.get_data()
         item_id = data.get('item_id')
-        cost = float(message.text.strip())
-        user = get_or_create_user(message.from_user)
-        item = get_item(item_id)
-        calc = calc_cost(user, cost, item.shipping)
+        cost = parse_price(message.text)
+        user = await get_or_create_user(message.from_user)
+        item = await get_item(item_id)
+        calc = await calc_cost(user, cost, item.id)
         await message.delete()
         text = item.name
         text += f'\nСтоимость товара: {cost} ¥'
@@ -8,7 +8,7 @@ from aiogram.types import Message, CallbackQuery, Chat
 
 from services.func import get_or_create_user
 
-router: Router = Router()
+router: Router = Router(name='echo')
 
 
 # Последний эхо-фильтр
@@ -1,38 +1,120 @@
 from aiogram import Dispatcher, types, Router, Bot, F
 from aiogram.enums import ContentType
-from aiogram.filters import Command, CommandStart, StateFilter, BaseFilter
+from aiogram.filters import Command, CommandStart, StateFilter, BaseFilter, CommandObject
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import CallbackQuery, Message, URLInputFile, BufferedInputFile
 
 from aiogram.fsm.context import FSMContext
 
-from config_data.bot_conf import get_my_loggers
+from config_data.bot_conf import conf, get_my_loggers
 from database.db import User, Item, Order
 from keyboards.keyboards import start_kb, custom_kb, cart_kb
 from lexicon import lexicon
-from services.func import get_or_create_user, get_order_confirm_text, get_bucket_text, get_cart_delete_kb_btn, \
-    delete_order, update_pay_confirm, update_user, send_orders_to_manager, get_order, cancel_order, order_buy, \
-    get_order_from_msg
+from services.cache_bus import publish
+from services.catalog import catalog
+from services.order_status import cancel_order, order_buy, change_status_many, parse_bulk_filter
+from services.settings import settings_cache
+from services.func import get_or_create_user, get_order_confirm_text, \
+    delete_order, update_pay_confirm, update_user, send_orders_to_manager, get_order, get_order_from_msg, \
+    read_bot_settings, notify_buyers, delete_messages, get_manager_order_text
+from services.media import input_photo
 
 logger, err_log = get_my_loggers()
 
-router: Router = Router()
+router: Router = Router(name='manager')
 
 
 class FSMManager(StatesGroup):
     delete = State()
 
 
+@router.message(Command(commands=['reload']))
+async def reload_cache(message: Message):
+    """
+    Сброс кэшей каталога и настроек после правки таблиц в обход бота
+    """
+    if str(message.from_user.id) not in conf.tg_bot.admin_ids:
+        return
+    catalog.invalidate()
+    settings_cache.invalidate()
+    await publish('catalog')
+    await publish('settings')
+    await message.answer('Каталог и настройки будут перечитаны')
+
+
+# Массовая операция -> новый статус и текст для покупателя
+BULK_ACTIONS = {
+    'confirm': ('buyed', 'Выкуплены заказы'),
+    'cancel': ('canceled', 'Отменены заказы'),
+}
+BULK_HELP = ('Формат:\n'
+             '/bulk confirm 12,13,20-25\n'
+             '/bulk cancel payed before 2023-11-01')
+
+
+@router.message(Command(commands=['bulk']))
+async def bulk_orders(message: Message, command: CommandObject, bot: Bot):
+    """
+    Подтверждение или отмена многих заказов одной командой:
+    один UPDATE, одно уведомление на покупателя, удаление сообщений пачками
+    """
+    if str(message.from_user.id) not in conf.tg_bot.admin_ids:
+        return
+    try:
+        action, raw_filter = (command.args or '').split(maxsplit=1)
+        status, title = BULK_ACTIONS[action]
+        criteria = parse_bulk_filter(raw_filter)
+    except (ValueError, KeyError):
+        await message.answer(BULK_HELP)
+        return
+    try:
+        changes = await change_status_many(status, *criteria)
+        if not changes:
+            await message.answer('Подходящих заказов нет')
+            return
+        footer = lexicon.LEXICON.get('support') if status == 'canceled' else ''
+        await notify_buyers(bot, changes, title, footer)
+        manager_id = await read_bot_settings('manager_id')
+        await delete_messages(bot, manager_id, [change.manager_msg_id for change in changes if change.manager_msg_id])
+        order_ids = ', '.join(str(change.order_id) for change in changes)
+        await message.answer(f'{title}: {order_ids}')
+    except Exception as err:
+        err_log.error(f'Ошибка массовой операции {command.args}: {err}')
+        await message.answer(f'Ошибка: {err}')
+
+
+@router.message(Command(commands=['order']))
+async def show_order(message: Message, command: CommandObject):
+    """
+    Карточка заказа по id для разбора споров, включая архивные: /order 123
+    """
+    if str(message.from_user.id) not in conf.tg_bot.admin_ids:
+        return
+    try:
+        order = await get_order(int(command.args or ''))
+    except ValueError:
+        await message.answer('Формат: /order 123')
+        return
+    if not order:
+        await message.answer('Заказ не найден')
+        return
+    text = f'Заказ {order.id}, статус {order.status}\n'
+    text += get_manager_order_text(order.user, order)
+    # Для разбора спора - полное фото, не превью
+    photo = await input_photo(order.photo_file_id, order.photo_key, 'item_photo_name')
+    await message.answer_photo(photo=photo, caption=text)
+
+
 # Перехват ответа
 @router.message(F.reply_to_message, F.text.lower().startswith('отменить '))
 async def get_reply(message: Message, state: FSMContext, bot: Bot):
     msg = message.reply_to_message
     raw_order_id = message.text.lower().strip().split('отменить ')[-1]
     order_id = int(raw_order_id.strip())
-    order = get_order_from_msg(msg.message_id)
+    order = await get_order_from_msg(msg.message_id)
     if order and order_id == order.id:
         await state.set_state(FSMManager.delete)
-        await state.update_data(msg=msg, order_id=order_id)
+        await state.update_data(msg_chat_id=msg.chat.id, msg_id=msg.message_id, order_id=order_id)
         await message.answer('Укажите причину отмены')
     else:
         await message.answer('Заказ не найден')
@@ -46,19 +128,17 @@ async def delete(message: Message, state: FSMContext, bot: Bot):
     try:
         reason = message.text
         data = await state.get_data()
-        msg = data.get('msg')
         order_id = data.get('order_id')
-        order = get_order(order_id)
-        if order and order_id == order.id:
+        # Отмену выполнит только один из менеджеров/процессов
+        changed = await cancel_order(order_id, manager_msg_id=data.get('msg_id'))
+        if changed:
             cancel_text = f'Заказ {order_id} отменен:\n{reason}'
-            await bot.send_message(chat_id=order.user.tg_id, text=cancel_text)
-            cancel_order(order_id)
-            await bot.send_message(chat_id=order.user.tg_id, text=lexicon.LEXICON.get('support'))
-            cancel_order(order_id)
-            await bot.delete_message(chat_id=msg.chat.id, message_id=msg.message_id)
+            await bot.send_message(chat_id=changed.tg_id, text=cancel_text)
+            await bot.send_message(chat_id=changed.tg_id, text=lexicon.LEXICON.get('support'))
+            await bot.delete_message(chat_id=data.get('msg_chat_id'), message_id=data.get('msg_id'))
             await message.answer(f'Заказ {order_id} отменен')
         else:
-            await message.answer('Заказ не найден')
+            await message.answer(f'Заказ {order_id} не найден или уже отменен')
         await state.clear()
     except Exception as err:
         err_log.error(f'Ошибка при отмене заказа: {err}')
@@ -76,15 +156,15 @@ async def get_reply(message: Message, state: FSMContext, bot: Bot):
     raw_order_id = message.caption.lower().strip().split('подтвердить ')[-1]
     try:
         order_id = int(raw_order_id.strip())
-        order = get_order_from_msg(msg.message_id)
-        if order and order_id == order.id:
-            order_buy(order_id)
-            confirm_text = f'Заказ {order.id} выкуплен'
-            await bot.send_photo(chat_id=order.user.tg_id, photo=message.photo[2].file_id, caption=confirm_text)
+        # payed -> buyed одним UPDATE, повторное подтверждение ничего не изменит
+        changed = await order_buy(order_id, manager_msg_id=msg.message_id)
+        if changed:
+            confirm_text = f'Заказ {order_id} выкуплен'
+            await bot.send_photo(chat_id=changed.tg_id, photo=message.photo[-1].file_id, caption=confirm_text)
             await bot.delete_message(chat_id=msg.chat.id, message_id=msg.message_id)
-            await message.answer(f'Заказ {order.id} подтвержден')
+            await message.answer(f'Заказ {order_id} подтвержден')
         else:
-            await message.answer('Заказ не найден')
+            await message.answer(f'Заказ {order_id} не найден или уже обработан')
     except Exception as err:
         err_log.error(f'Ошибка при подтверждении заказа {raw_order_id}: {err}')
         await message.answer(f'Ошиюка: {err}')
@@ -13,12 +13,19 @@ from config_data.bot_conf import get_my_loggers
 from database.db import User, Item, Order
 from handlers.user_handlers import FSMUser
 from keyboards.keyboards import start_kb, custom_kb, cart_kb
-from services.func import get_or_create_user, get_order_confirm_text, get_bucket_text, get_cart_delete_kb_btn, \
+from services.catalog import catalog
+from services.func import get_or_create_user, get_order_confirm_text, \
     delete_order, update_pay_confirm, update_user, send_orders_to_manager
+from services.cart import load_cart, get_bucket_text
+from services.drafts import OrderDraft
+from services.locks import distributed_lock, LockNotAcquired
+from services.media import store_photo, input_photo
+from services.order_status import claim_payed
+from services.pricing import parse_price
 
 logger, err_log = get_my_loggers()
 
-router: Router = Router()
+router: Router = Router(name='orders')
 
 
 class FSMOrder(StatesGroup):
@@ -34,42 +41,37 @@ class FSMOrder(StatesGroup):
 @router.callback_query(F.data == 'cart')
 async def order_start(callback: CallbackQuery, state: FSMContext):
     await callback.message.delete()
-    user = get_or_create_user(callback.from_user)
-    text = get_bucket_text(user)
+    user = await get_or_create_user(callback.from_user)
+    text = await get_bucket_text(user)
     await callback.message.answer(text, reply_markup=cart_kb)
 
 
 @router.callback_query(F.data == 'order')
 async def order_start(callback: CallbackQuery, state: FSMContext):
     await callback.message.delete()
-    btn = Item().menu_btn()
     await state.set_state(FSMOrder.selected)
     # text = get_bucket_text(get_or_create_user(callback.from_user))
     text = '\n\nВыберите тип товара:'
-    await callback.message.answer(text, reply_markup=custom_kb(1, btn))
+    await callback.message.answer(text, reply_markup=await catalog.item_menu())
 
 
 @router.callback_query(F.data.startswith('item_'), StateFilter(FSMOrder.selected))
 async def order_item_selected(callback: CallbackQuery, state: FSMContext):
     data = callback.data
     item_id = int(data.split('item_')[-1])
-    order = Order(item_id=item_id)
-    await state.update_data(order=order)
+    order = OrderDraft(item_id=item_id)
+    await state.update_data(order=order.to_state())
     await callback.message.edit_text('Вставьте фото товара')
     await state.set_state(FSMOrder.order_photo)
 
 
 @router.message(F.content_type.in_({ContentType.PHOTO}), FSMOrder.order_photo)
 async def order_send_photo(message: Message, state: FSMContext, bot: Bot):
-    photo = message.photo
-    photo_id = photo[2].file_id
-    mem_photo = io.BytesIO()
-    await bot.download(file=photo_id, destination=mem_photo)
+    photo = await store_photo(bot, message.photo[-1], thumbnail=True)
     data = await state.get_data()
-    order = data['order']
-    bytes_photo = mem_photo.read()
-    order.photo = bytes_photo
-    await state.update_data(order=order)
+    order = OrderDraft.from_state(data['order'])
+    order.set_photo(photo)
+    await state.update_data(order=order.to_state())
     # photo = BufferedInputFile(mem_photo.read(), filename='photo_name')
     # await message.answer_photo(photo=photo, caption='caption')
     await message.answer('Укажите ссылку на товар')
@@ -79,9 +81,9 @@ async def order_send_photo(message: Message, state: FSMContext, bot: Bot):
 @router.message(StateFilter(FSMOrder.order_link))
 async def order_link(message: Message, state: FSMContext, bot: Bot):
     data = await state.get_data()
-    order = data['order']
+    order = OrderDraft.from_state(data['order'])
     order.link = message.text
-    await state.update_data(order=order)
+    await state.update_data(order=order.to_state())
     await message.answer('Укажите размер товара (если есть) или напишите "нет"')
     await state.set_state(FSMOrder.order_size)
 
@@ -89,9 +91,9 @@ async def order_link(message: Message, state: FSMContext, bot: Bot):
 @router.message(StateFilter(FSMOrder.order_size))
 async def order_size(message: Message, state: FSMContext, bot: Bot):
     data = await state.get_data()
-    order = data['order']
+    order = OrderDraft.from_state(data['order'])
     order.size = message.text
-    await state.update_data(order=order)
+    await state.update_data(order=order.to_state())
     await message.answer('Укажите стоимость')
     await state.set_state(FSMOrder.order_cost)
 
@@ -100,13 +102,13 @@ async def order_size(message: Message, state: FSMContext, bot: Bot):
 async def order_cost(message: Message, state: FSMContext, bot: Bot):
     try:
         data = await state.get_data()
-        order = data['order']
-        cost = float(message.text.strip())
-        order.cost = cost
-        await state.update_data(order=order)
+        order = OrderDraft.from_state(data['order'])
+        # Draft хранится в FSM как JSON, колонка cost - float
+        order.cost = float(parse_price(message.text))
+        await state.update_data(order=order.to_state())
         text = 'Всё ли указано верно?\n\n'
         text += get_order_confirm_text(order)
-        photo = BufferedInputFile(order.photo, filename='photo_name')
+        photo = await input_photo(order.photo_file_id, order.photo_key, 'photo_name')
         confirm_btn = {
             'Изменить': 'cart',
             'Верно!': 'order_confirm'
@@ -121,20 +123,21 @@ async def order_cost(message: Message, state: FSMContext, bot: Bot):
 async def order_confirm(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.message.delete()
     data = await state.get_data()
-    order = data['order']
-    user = get_or_create_user(callback.from_user)
-    order.user_id = user.id
-    order.save()
-    text = get_bucket_text(user)
+    draft = OrderDraft.from_state(data['order'])
+    user = await get_or_create_user(callback.from_user)
+    order = draft.to_order(user.id)
+    await order.save()
+    text = await get_bucket_text(user)
     await callback.message.answer(text, reply_markup=cart_kb)
 
 
 @router.callback_query(F.data == 'cart_del')
 async def del_select(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.message.delete()
-    user = get_or_create_user(callback.from_user)
-    btn = get_cart_delete_kb_btn(user)
-    text = get_bucket_text(user)
+    user = await get_or_create_user(callback.from_user)
+    cart = await load_cart(user)
+    btn = cart.delete_buttons()
+    text = cart.text()
     text += '\nКакой товар удалить?'
     await callback.message.answer(text, reply_markup=custom_kb(1, btn))
 
@@ -144,14 +147,14 @@ async def cart_del(callback: CallbackQuery, state: FSMContext):
     await callback.message.delete()
     data = callback.data
     order_id = int(data.split('cartdel_')[-1])
-    delete_order(order_id)
-    text = get_bucket_text(get_or_create_user(callback.from_user))
+    await delete_order(order_id)
+    text = await get_bucket_text(await get_or_create_user(callback.from_user))
     await callback.message.answer(text, reply_markup=cart_kb)
 
 
 @router.callback_query(F.data == 'pay_confirm')
 async def pay_confirm(callback: CallbackQuery, state: FSMContext, bot: Bot):
-    user = get_or_create_user(callback.from_user)
+    user = await get_or_create_user(callback.from_user)
     if user.fio and user.phone and user.address:
         await callback.message.delete()
         await callback.message.answer('Пришлите, пожалуйста, чек')
@@ -164,24 +167,30 @@ async def pay_confirm(callback: CallbackQuery, state: FSMContext, bot: Bot):
 
 @router.message(F.content_type.in_({ContentType.PHOTO}), FSMOrder.pay_confirm)
 async def order_pay_confirm(message: Message, state: FSMContext, bot: Bot):
-    print('confirm')
     try:
-        photo = message.photo
-        photo_id = photo[2].file_id
-        mem_photo = io.BytesIO()
-        await bot.download(file=photo_id, destination=mem_photo)
-        user = get_or_create_user(message.from_user)
-        text = 'Ваш заказ оформлен:\n'
-        text += get_bucket_text(user)
-        await message.answer(text)
-        bytes_photo = mem_photo.read()
-        update_pay_confirm(user, bytes_photo)
-        await message.answer('Спасибо за покупку!\nНаш менеджер подтвердит оплату в течение 24 часов, и пришлёт скриншот выкупа.',
-                             reply_markup=start_kb)
-        # Действия после оплаты
-        update_user(user, {'is_newbie': 0})
-        await send_orders_to_manager(user, bot)
+        user = await get_or_create_user(message.from_user)
+        # Повторный чек или второй процесс не должны оформить корзину дважды
+        async with distributed_lock(f'checkout:{user.id}', wait=0):
+            cart = await load_cart(user)
+            if not cart.orders:
+                await message.answer(cart.text(), reply_markup=start_kb)
+                await state.clear()
+                return
+            photo = await store_photo(bot, message.photo[-1])
+            text = 'Ваш заказ оформлен:\n'
+            text += cart.text()
+            await message.answer(text)
+            await update_pay_confirm(user, photo)
+            await message.answer('Спасибо за покупку!\nНаш менеджер подтвердит оплату в течение 24 часов, и пришлёт скриншот выкупа.',
+                                 reply_markup=start_kb)
+            # Действия после оплаты
+            await update_user(user, {'is_newbie': 0})
+            # После смены статуса повторный чек заказов не найдет, блокировка дальше не нужна:
+            # отправка менеджеру может ждать лимитера дольше таймаута блокировки
+            orders = await claim_payed([order.id for order in cart.orders])
+        await send_orders_to_manager(user, bot, orders)
         await state.clear()
-
+    except LockNotAcquired:
+        await message.answer('Оплата уже обрабатывается')
     except Exception as err:
         logger.error(f'Ошибка при оплате: {err}')
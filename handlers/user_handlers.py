@@ -11,11 +11,13 @@ from config_data.bot_conf import get_my_loggers
 from database.db import User, Faq
 from keyboards.keyboards import start_kb, cart_kb, custom_kb
 from lexicon.lexicon import LEXICON
-from services.func import get_or_create_user, update_user, get_bucket_text, get_faq
+from services.cart import get_bucket_text
+from services.catalog import catalog
+from services.func import get_or_create_user, update_user, get_faq
 
 logger, err_log = get_my_loggers()
 
-router: Router = Router()
+router: Router = Router(name='user_handlers')
 
 
 class FSMUser(StatesGroup):
@@ -28,7 +30,7 @@ class FSMUser(StatesGroup):
 async def start(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await state.clear()
     tg_user = callback.from_user
-    user: User = get_or_create_user(tg_user)
+    user: User = await get_or_create_user(tg_user)
     text = 'Выберите действие:'
     # await callback.message.delete()
     await callback.message.delete_reply_markup()
@@ -39,7 +41,7 @@ async def start(callback: CallbackQuery, state: FSMContext, bot: Bot):
 async def process_start_command(message: Message, state: FSMContext):
     await state.clear()
     tg_user = message.from_user
-    user: User = get_or_create_user(tg_user)
+    user: User = await get_or_create_user(tg_user)
     text = 'Выберите действие:'
     await message.answer(text, reply_markup=start_kb)
 
@@ -72,27 +74,26 @@ async def address(message: Message, state: FSMContext, bot: Bot):
     address = message.text.strip()
     await state.update_data(address=address)
     data = await state.get_data()
-    user = get_or_create_user(message.from_user)
-    update_user(user, data)
+    user = await get_or_create_user(message.from_user)
+    await update_user(user, data)
     await state.clear()
-    text = get_bucket_text(get_or_create_user(message.from_user))
+    text = await get_bucket_text(await get_or_create_user(message.from_user))
     await message.answer(text, reply_markup=cart_kb)
 
 
 @router.callback_query(F.data == 'faq')
 async def faq(callback: CallbackQuery, state: FSMContext, bot: Bot):
     await callback.message.delete()
-    btn = Faq().menu_btn()
-    await callback.message.answer('Выберите вопроc:', reply_markup=custom_kb(1, btn))
+    await callback.message.answer('Выберите вопроc:', reply_markup=await catalog.faq_menu())
 
 
 @router.callback_query(F.data.startswith('answer_'))
 async def answer(callback: CallbackQuery, state: FSMContext, bot: Bot):
     data = callback.data
     question_id = int(data.split('answer_')[-1])
-    my_faq: Faq = get_faq(question_id)
+    my_faq: Faq = await get_faq(question_id)
     text = f'{my_faq.question}\n\n{my_faq.answer}'
-    await callback.message.edit_text(text, reply_markup=custom_kb(1, Faq().menu_btn()))
+    await callback.message.edit_text(text, reply_markup=await catalog.faq_menu())
 
 
 @router.callback_query(F.data == 'items')
@@ -1,56 +1,195 @@
 import asyncio
 import datetime
+import multiprocessing
 
 from aiogram import Bot, Dispatcher
-import aioschedule
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 
 from config_data.bot_conf import conf, get_my_loggers
+from database.db import dispose_engines
+from database.redis_db import redis
 
 from handlers import user_handlers, orders, echo, manager, calc
-from services.func import get_cny_to_rub
+from middlewares.metrics import UpdateMetricsMiddleware, HandlerMetricsMiddleware, ApiMetricsMiddleware, \
+    setup_metrics, start_metrics_server, prepare_multiprocess_dir
+from middlewares.log_context import LogContextMiddleware, LogHandlerMiddleware
+from middlewares.query_stats import QueryStatsMiddleware, QueryHandlerMiddleware
+from services import cache_bus
+from services.archive import ensure_partitions, archive_orders
+from services.currency import currency_fetcher
+from services.func import refresh_currency_rate
+from services.images import image_pool
+from services.scheduler import scheduler
+from services.throttle import OutboundLimiter
 
 logger, err_log = get_my_loggers()
 
 
 async def refresh_currency():
     logger.info('Обновление валюты по графику')
-    cny = get_cny_to_rub()
+    cny = await refresh_currency_rate()
     logger.debug(f'Обновлено: {cny}')
 
 
-async def jobs():
-    time_start = '5:00'
-    aioschedule.every().day.at(time_start).do(refresh_currency)
-    # aioschedule.every(1).minutes.do(refresh_currency)
-    while True:
-        await aioschedule.run_pending()
-        await asyncio.sleep(10)
+async def maintain_orders():
+    """Партиции orders на следующие месяцы и перенос старых заказов в архив"""
+    await ensure_partitions()
+    await archive_orders()
 
 
-async def main():
-    logger.info('Starting bot')
-    bot: Bot = Bot(token=conf.tg_bot.token, parse_mode='HTML')
-    dp: Dispatcher = Dispatcher()
-    asyncio.create_task(jobs())
+def setup_jobs():
+    """
+    Фоновые задачи. Пропущенные за время простоя (и ни разу не выполненные)
+    запуски выполняются при старте по очереди: первым - курс валюты
+    """
+    scheduler.daily('refresh_currency', refresh_currency, at='05:00', jitter=60)
+    scheduler.daily('maintain_orders', maintain_orders, at='04:00', jitter=300)
+
+
+def get_storage() -> BaseStorage:
+    """FSM в Redis, если он настроен: переживает рестарт и общий для всех процессов"""
+    if redis is None:
+        logger.warning('REDIS_HOST не задан, FSM хранится в памяти')
+        return MemoryStorage()
+    fsm_ttl = datetime.timedelta(days=7)
+    return RedisStorage(redis=redis, state_ttl=fsm_ttl, data_ttl=fsm_ttl)
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """
+    Апдейты через webhook на aiohttp.
+    Несколько процессов могут слушать один порт (SO_REUSEPORT),
+    необработанные апдейты сохраняются между перезапусками
+    """
+    secret = conf.webhook.secret or None
+    if not secret:
+        logger.warning('WEBHOOK_SECRET не задан, запросы к webhook не проверяются')
+    await bot.set_webhook(url=conf.webhook.url,
+                          secret_token=secret,
+                          allowed_updates=dp.resolve_used_update_types(),
+                          drop_pending_updates=False)
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret).register(app, path=conf.webhook.path)
+    setup_application(app, dp, bot=bot)
+    setup_metrics(app)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=conf.webhook.host, port=conf.webhook.port, reuse_port=True)
+    await site.start()
+    logger.info(f'Webhook слушает {conf.webhook.host}:{conf.webhook.port}{conf.webhook.path}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def create_dispatcher(storage: BaseStorage | None = None) -> Dispatcher:
+    dp: Dispatcher = Dispatcher(storage=storage or get_storage())
+    dp.update.outer_middleware(LogContextMiddleware())
+    dp.message.middleware(LogHandlerMiddleware())
+    dp.callback_query.middleware(LogHandlerMiddleware())
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    dp.update.outer_middleware(QueryStatsMiddleware())
+    dp.message.middleware(QueryHandlerMiddleware())
+    dp.callback_query.middleware(QueryHandlerMiddleware())
     # Регистрируем
     dp.include_router(user_handlers.router)
     dp.include_router(orders.router)
     dp.include_router(manager.router)
     dp.include_router(calc.router)
     dp.include_router(echo.router)
+    return dp
+
+
+async def main(worker: int = 0):
+    logger.info(f'Starting bot, worker {worker}')
+    bot: Bot = Bot(token=conf.tg_bot.token, parse_mode='HTML')
+    bot.session.middleware(OutboundLimiter())
+    # После лимитера: меряем сам запрос, без ожидания в очереди
+    bot.session.middleware(ApiMetricsMiddleware())
+    dp = create_dispatcher()
+    try:
+        # Партиции нужны до первой вставки, не дожидаясь maintain_orders
+        await ensure_partitions()
+    except Exception as err:
+        err_log.error(f'Партиции orders не проверены: {err}')
+    setup_jobs()
+    asyncio.create_task(scheduler.run())
+    asyncio.create_task(cache_bus.listen())
 
-    await bot.delete_webhook(drop_pending_updates=True)
     try:
-        if conf.tg_bot.admin_ids:
+        if conf.tg_bot.admin_ids and worker == 0:
             await bot.send_message(
                 conf.tg_bot.admin_ids[0], f'Бот запущен.\n{datetime.datetime.now()}')
     except Exception:
         err_log.error(f'Не могу отравить сообщение {conf.tg_bot.admin_ids[0]}')
-    await dp.start_polling(bot)
+    try:
+        if conf.webhook.mode == 'webhook':
+            await run_webhook(dp, bot)
+        else:
+            if conf.logic.metrics_port:
+                await start_metrics_server(conf.webhook.host, conf.logic.metrics_port)
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
+    finally:
+        await dp.storage.close()
+        await currency_fetcher.close()
+        image_pool.close()
+        await dispose_engines()
 
 
-if __name__ == '__main__':
+def run_worker(worker: int = 0):
     try:
-        asyncio.run(main())
+        asyncio.run(main(worker))
     except (KeyboardInterrupt, SystemExit):
-        logger.info('Bot stopped!')
\ No newline at end of file
+        logger.info(f'Bot stopped! worker {worker}')
+
+
+def run_workers(count: int):
+    """
+    Несколько процессов на одном порту webhook.
+    FSM, кэши и блокировки общие через Redis/Postgres, метрики - через файлы prometheus_client
+    """
+    # Метрики всех процессов в общем каталоге, иначе /metrics отдает счетчики случайного воркера
+    logger.info(f'Метрики процессов в {prepare_multiprocess_dir()}')
+    # spawn, а не fork: воркер заново настраивает логирование (потоки QueueListener
+    # при fork не копируются), движки БД и Redis
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=(num,)) for num in range(count)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info('Bot stopped!')
+
+
+def resolve_workers() -> int:
+    """
+    Сколько процессов запускать.
+    Без Redis FSM и сброс кэшей у каждого процесса свои, поэтому только один
+    """
+    workers = conf.webhook.workers
+    if workers > 1 and conf.webhook.mode != 'webhook':
+        logger.warning('Polling работает в одном процессе, WEB_WORKERS игнорируется')
+        return 1
+    if workers > 1 and redis is None:
+        err_log.error(f'WEB_WORKERS={workers} требует Redis (REDIS_HOST): '
+                      f'иначе FSM и кэши пользователей расходятся между процессами. Запущен один процесс')
+        return 1
+    return max(workers, 1)
+
+
+if __name__ == '__main__':
+    workers = resolve_workers()
+    if workers > 1:
+        run_workers(workers)
+    else:
+        run_worker()
\ No newline at end of file
@@ -0,0 +1,14 @@
+from typing import Any
+
+
+def handler_name(data: dict[str, Any]) -> tuple[str, str]:
+    """
+    Роутер и хендлер апдейта для метрик, логов и учета запросов.
+    Одноименные хендлеры (get_reply, order_start) различаются строкой определения
+    """
+    callback = data['handler'].callback
+    code = getattr(callback, '__code__', None)
+    name = getattr(callback, '__qualname__', repr(callback))
+    if code is not None:
+        name = f'{name}:{code.co_firstlineno}'
+    return data['event_router'].name, name
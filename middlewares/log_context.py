@@ -0,0 +1,34 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config_data.log_conf import log_update_id, log_user_id, log_handler
+from middlewares.handler_name import handler_name
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: update_id и user_id для всех записей лога"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: dict[str, Any]) -> Any:
+        from_user = getattr(event.event, 'from_user', None)
+        update_token = log_update_id.set(event.update_id)
+        user_token = log_user_id.set(from_user.id if from_user else None)
+        try:
+            return await handler(event, data)
+        finally:
+            log_update_id.reset(update_token)
+            log_user_id.reset(user_token)
+
+
+class LogHandlerMiddleware(BaseMiddleware):
+    """Inner-middleware: имя хендлера в записях лога"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: dict[str, Any]) -> Any:
+        token = log_handler.set('.'.join(handler_name(data)))
+        try:
+            return await handler(event, data)
+        finally:
+            log_handler.reset(token)
@@ -0,0 +1,121 @@
+import glob
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from aiohttp import web
+from prometheus_client import Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, \
+    multiprocess
+
+from config_data.bot_conf import get_my_loggers
+from middlewares.handler_name import handler_name
+
+logger, err_log = get_my_loggers()
+
+UPDATES = Counter('bot_updates_total', 'Апдейты по типу', ['type'])
+UPDATE_ERRORS = Counter('bot_update_errors_total', 'Необработанные исключения по типу апдейта', ['type'])
+HANDLER_LATENCY = Histogram('bot_handler_seconds', 'Время работы хендлера', ['router', 'handler'],
+                            buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+HANDLER_ERRORS = Counter('bot_handler_errors_total', 'Исключения в хендлерах', ['router', 'handler'])
+API_LATENCY = Histogram('bot_api_request_seconds', 'Время запроса к Bot API', ['method'],
+                        buckets=(.025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+API_REQUESTS = Counter('bot_api_requests_total', 'Запросы к Bot API по результату', ['method', 'status'])
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: счетчик апдейтов и ошибок"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: dict[str, Any]) -> Any:
+        event_type = event.event_type
+        UPDATES.labels(event_type).inc()
+        try:
+            return await handler(event, data)
+        except Exception:
+            UPDATE_ERRORS.labels(event_type).inc()
+            raise
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware: время и ошибки конкретного хендлера"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: dict[str, Any]) -> Any:
+        labels = handler_name(data)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(*labels).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии Bot: время и статус каждого запроса"""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType],
+                       bot: Bot, method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        method_name = type(method).__name__
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as err:
+            status = type(err).__name__
+            raise
+        except Exception:
+            status = 'network'
+            raise
+        finally:
+            API_LATENCY.labels(method_name).observe(time.perf_counter() - start)
+            API_REQUESTS.labels(method_name, status).inc()
+
+
+def prepare_multiprocess_dir() -> str:
+    """
+    Вызывается до запуска воркеров: каждый процесс пишет метрики в файлы этого каталога,
+    /metrics любого процесса отдает сумму по всем. Файлы прошлого запуска удаляются
+    """
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR') or tempfile.mkdtemp(prefix='bot_metrics_')
+    os.makedirs(path, exist_ok=True)
+    for file in glob.glob(os.path.join(path, '*.db')):
+        os.remove(file)
+    # Воркеры наследуют окружение и включают режим multiprocess при импорте prometheus_client
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = path
+    return path
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=generate_latest(get_registry()), headers={'Content-Type': CONTENT_TYPE_LATEST})
+
+
+def setup_metrics(app: web.Application, path: str = '/metrics'):
+    app.router.add_get(path, metrics_handler)
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Отдельный /metrics для режима polling"""
+    app = web.Application()
+    setup_metrics(app)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port, reuse_port=True).start()
+    logger.info(f'Метрики на {host}:{port}/metrics')
+    return runner
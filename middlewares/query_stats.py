@@ -0,0 +1,37 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config_data.bot_conf import conf, get_my_loggers
+from database.query_stats import count_queries, current_stats
+from middlewares.handler_name import handler_name
+
+logger, err_log = get_my_loggers()
+
+
+class QueryStatsMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: все SQL-запросы апдейта в одном QueryStats"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: dict[str, Any]) -> Any:
+        with count_queries(event.update_id) as stats:
+            try:
+                return await handler(event, data)
+            finally:
+                if stats.count > conf.logic.query_budget:
+                    logger.warning(f'Апдейт {stats.update_id} ({stats.handler}): {stats.count} запросов, '
+                                   f'{stats.duration * 1000:.0f} мс')
+                else:
+                    logger.debug(f'Апдейт {stats.update_id} ({stats.handler}): {stats.count} запросов')
+
+
+class QueryHandlerMiddleware(BaseMiddleware):
+    """Inner-middleware: подписывает QueryStats именем хендлера"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: dict[str, Any]) -> Any:
+        stats = current_stats.get()
+        if stats is not None:
+            stats.handler = '.'.join(handler_name(data))
+        return await handler(event, data)
@@ -0,0 +1,69 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('tg_id', sa.String(30), nullable=False),
+        sa.Column('username', sa.String(100), nullable=True),
+        sa.Column('register_date', sa.DateTime(), nullable=True),
+        sa.Column('fio', sa.String(200), nullable=True),
+        sa.Column('phone', sa.String(20), nullable=True),
+        sa.Column('address', sa.String(200), nullable=True),
+        sa.Column('is_newbie', sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        'items',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('shipping', sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('item_id', sa.Integer(), sa.ForeignKey('items.id', ondelete='SET NULL'), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('photo', sa.LargeBinary(), nullable=False),
+        sa.Column('link', sa.String(200), nullable=False),
+        sa.Column('size', sa.String(50), nullable=False),
+        sa.Column('cost', sa.Float(precision=2), nullable=False),
+        sa.Column('pay_confirm', sa.LargeBinary(), nullable=True),
+        sa.Column('pay_date', sa.DateTime(), nullable=True),
+        sa.Column('manager_msg_id', sa.Integer(), nullable=True),
+    )
+    op.create_table(
+        'bot_settings',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('name', sa.String(50), nullable=False),
+        sa.Column('value', sa.String(255), nullable=True),
+        sa.Column('description', sa.String(500), nullable=True),
+    )
+    op.create_table(
+        'faq',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('question', sa.String(50), nullable=False),
+        sa.Column('answer', sa.String(2000), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('faq')
+    op.drop_table('bot_settings')
+    op.drop_table('orders')
+    op.drop_table('items')
+    op.drop_table('users')
@@ -0,0 +1,46 @@
+"""order photos to blobs, telegram file_id
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:10:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'blobs',
+        sa.Column('key', sa.String(64), primary_key=True),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+    )
+    for prefix in ('photo', 'pay_confirm'):
+        op.add_column('orders', sa.Column(f'{prefix}_key', sa.String(64), sa.ForeignKey('blobs.key'), nullable=True))
+        op.add_column('orders', sa.Column(f'{prefix}_file_id', sa.String(200), nullable=True))
+        op.add_column('orders', sa.Column(f'{prefix}_file_unique_id', sa.String(100), nullable=True))
+        # Переносим байты в blobs по sha256, одинаковые фото сохраняются один раз
+        op.execute(f"""
+            INSERT INTO blobs (key, data, size)
+            SELECT DISTINCT ON (encode(sha256({prefix}), 'hex')) encode(sha256({prefix}), 'hex'), {prefix}, length({prefix})
+            FROM orders WHERE {prefix} IS NOT NULL
+            ON CONFLICT (key) DO NOTHING
+        """)
+        op.execute(f"UPDATE orders SET {prefix}_key = encode(sha256({prefix}), 'hex') WHERE {prefix} IS NOT NULL")
+        op.drop_column('orders', prefix)
+
+
+def downgrade():
+    for prefix in ('photo', 'pay_confirm'):
+        op.add_column('orders', sa.Column(prefix, sa.LargeBinary(), nullable=True))
+        op.execute(f'UPDATE orders SET {prefix} = blobs.data FROM blobs WHERE blobs.key = orders.{prefix}_key')
+        op.drop_column('orders', f'{prefix}_file_unique_id')
+        op.drop_column('orders', f'{prefix}_file_id')
+        op.drop_column('orders', f'{prefix}_key')
+    op.drop_table('blobs')
@@ -0,0 +1,38 @@
+"""indexes for hot queries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:20:00
+"""
+from alembic import op
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Дубли tg_id из-за гонки в get_or_create_user: заказы переносим на первую запись
+    op.execute("""
+        UPDATE orders SET user_id = d.keep_id
+        FROM (SELECT id, min(id) OVER (PARTITION BY tg_id) AS keep_id FROM users) d
+        WHERE orders.user_id = d.id AND d.id <> d.keep_id
+    """)
+    op.execute("""
+        DELETE FROM users USING
+            (SELECT id, min(id) OVER (PARTITION BY tg_id) AS keep_id FROM users) d
+        WHERE users.id = d.id AND d.id <> d.keep_id
+    """)
+    op.create_unique_constraint('uq_users_tg_id', 'users', ['tg_id'])
+    op.create_unique_constraint('uq_bot_settings_name', 'bot_settings', ['name'])
+    op.create_index('ix_orders_user_id_status', 'orders', ['user_id', 'status'])
+    op.create_index('ix_orders_manager_msg_id', 'orders', ['manager_msg_id'])
+
+
+def downgrade():
+    op.drop_index('ix_orders_manager_msg_id', table_name='orders')
+    op.drop_index('ix_orders_user_id_status', table_name='orders')
+    op.drop_constraint('uq_bot_settings_name', 'bot_settings')
+    op.drop_constraint('uq_users_tg_id', 'users')
@@ -0,0 +1,22 @@
+"""order photo thumbnail
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:30:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('orders', sa.Column('photo_thumb_key', sa.String(64), sa.ForeignKey('blobs.key'), nullable=True))
+
+
+def downgrade():
+    op.drop_column('orders', 'photo_thumb_key')
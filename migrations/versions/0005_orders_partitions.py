@@ -0,0 +1,117 @@
+"""orders partitioned by month, orders_archive
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:40:00
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# Месяцев вперед, для которых партиции создаются сразу
+AHEAD_MONTHS = 2
+
+
+def order_columns():
+    return [
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('item_id', sa.Integer(), sa.ForeignKey('items.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('photo_key', sa.String(64), sa.ForeignKey('blobs.key'), nullable=True),
+        sa.Column('photo_thumb_key', sa.String(64), sa.ForeignKey('blobs.key'), nullable=True),
+        sa.Column('photo_file_id', sa.String(200), nullable=True),
+        sa.Column('photo_file_unique_id', sa.String(100), nullable=True),
+        sa.Column('link', sa.String(200), nullable=False),
+        sa.Column('size', sa.String(50), nullable=False),
+        sa.Column('cost', sa.Float(precision=2), nullable=False),
+        sa.Column('pay_confirm_key', sa.String(64), sa.ForeignKey('blobs.key'), nullable=True),
+        sa.Column('pay_confirm_file_id', sa.String(200), nullable=True),
+        sa.Column('pay_confirm_file_unique_id', sa.String(100), nullable=True),
+        sa.Column('pay_date', sa.DateTime(), nullable=True),
+        sa.Column('manager_msg_id', sa.Integer(), nullable=True),
+    ]
+
+
+ORDER_COLUMNS = ', '.join(column.name for column in order_columns())
+
+
+def add_month(month: datetime.date) -> datetime.date:
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def create_month_partition(month: datetime.date):
+    op.execute(f"""
+        CREATE TABLE IF NOT EXISTS orders_{month:%Y_%m} PARTITION OF orders
+        FOR VALUES FROM ('{month}') TO ('{add_month(month)}')
+    """)
+
+
+def upgrade():
+    # Ключ партиционирования обязан входить в первичный ключ: (id, created)
+    op.create_table(
+        'orders_partitioned',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        *order_columns(),
+        sa.PrimaryKeyConstraint('id', 'created', name='pk_orders'),
+        postgresql_partition_by='RANGE (created)',
+    )
+    op.create_table(
+        'orders_archive',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('created', sa.DateTime(), nullable=False),
+        *order_columns(),
+        sa.Column('archived', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.execute('CREATE TABLE orders_default PARTITION OF orders_partitioned DEFAULT')
+
+    bind = op.get_bind()
+    first = bind.execute(sa.text('SELECT min(coalesce(pay_date, now())) FROM orders')).scalar()
+    month = (first or datetime.datetime.now()).date().replace(day=1)
+    last = datetime.date.today().replace(day=1)
+    for _ in range(AHEAD_MONTHS):
+        last = add_month(last)
+
+    # Данные и последовательность id переходят в новую таблицу
+    op.execute('ALTER SEQUENCE orders_id_seq OWNED BY NONE')
+    op.rename_table('orders', 'orders_plain')
+    op.rename_table('orders_partitioned', 'orders')
+    while month <= last:
+        create_month_partition(month)
+        month = add_month(month)
+    op.execute(f"""
+        INSERT INTO orders (id, created, {ORDER_COLUMNS})
+        SELECT id, coalesce(pay_date, now()), {ORDER_COLUMNS} FROM orders_plain
+    """)
+    op.drop_table('orders_plain')
+    op.execute("ALTER TABLE orders ALTER COLUMN id SET DEFAULT nextval('orders_id_seq')")
+    op.execute('ALTER SEQUENCE orders_id_seq OWNED BY orders.id')
+
+    op.create_index('ix_orders_user_id_status', 'orders', ['user_id', 'status'])
+    op.create_index('ix_orders_manager_msg_id', 'orders', ['manager_msg_id'])
+    op.create_index('ix_orders_status_created', 'orders', ['status', 'created'])
+
+
+def downgrade():
+    op.rename_table('orders', 'orders_partitioned')
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        *order_columns(),
+    )
+    for source in ('orders_partitioned', 'orders_archive'):
+        op.execute(f'INSERT INTO orders (id, {ORDER_COLUMNS}) SELECT id, {ORDER_COLUMNS} FROM {source}')
+    op.execute('ALTER SEQUENCE orders_id_seq OWNED BY NONE')
+    op.drop_table('orders_partitioned')
+    op.drop_table('orders_archive')
+    op.execute("ALTER TABLE orders ALTER COLUMN id SET DEFAULT nextval('orders_id_seq')")
+    op.execute('ALTER SEQUENCE orders_id_seq OWNED BY orders.id')
+    op.create_index('ix_orders_user_id_status', 'orders', ['user_id', 'status'])
+    op.create_index('ix_orders_manager_msg_id', 'orders', ['manager_msg_id'])
@@ -0,0 +1,26 @@
+"""job_runs for the scheduler
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:50:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_runs',
+        sa.Column('name', sa.String(100), primary_key=True),
+        sa.Column('last_run', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table('job_runs')
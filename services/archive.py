@@ -0,0 +1,82 @@
+"""
+Обслуживание orders: партиции на месяцы вперед и перенос
+завершенных заказов в orders_archive.
+"""
+import datetime
+
+from sqlalchemy import select, text, bindparam
+
+from config_data.bot_conf import conf, get_my_loggers
+from database.db import AsyncSession, Order, OrderArchive
+
+logger, err_log = get_my_loggers()
+
+# Статусы, после которых заказ больше не меняется
+FINAL_STATUSES = ('buyed', 'canceled')
+AHEAD_MONTHS = 2
+
+ARCHIVE_COLUMNS = ', '.join(column.name for column in OrderArchive.__table__.columns if column.name != 'archived')
+
+# Один пакет: DELETE из партиций и INSERT в архив в одном запросе
+ARCHIVE_BATCH_SQL = text(f"""
+    WITH moved AS (
+        DELETE FROM orders WHERE (id, created) IN (
+            SELECT id, created FROM orders
+            WHERE status IN :statuses AND created < :cutoff
+            LIMIT :batch
+        )
+        RETURNING {ARCHIVE_COLUMNS}
+    )
+    INSERT INTO orders_archive ({ARCHIVE_COLUMNS})
+    SELECT {ARCHIVE_COLUMNS} FROM moved
+""").bindparams(bindparam('statuses', value=FINAL_STATUSES, expanding=True))
+
+
+def add_month(month: datetime.date) -> datetime.date:
+    return (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+async def ensure_partitions(ahead: int = AHEAD_MONTHS):
+    """
+    Партиции на текущий и следующие месяцы.
+    Создаются заранее, пока в DEFAULT нет строк из их диапазона
+    """
+    month = datetime.date.today().replace(day=1)
+    async with AsyncSession() as session:
+        for _ in range(ahead + 1):
+            await session.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS orders_{month:%Y_%m} PARTITION OF orders
+                FOR VALUES FROM ('{month}') TO ('{add_month(month)}')
+            """))
+            month = add_month(month)
+        await session.commit()
+
+
+async def archive_orders(after_days: int | None = None, batch: int | None = None) -> int:
+    """
+    Переносит завершенные заказы старше after_days в orders_archive.
+    Пакетами по batch строк, каждый пакет - своя транзакция
+    """
+    after_days = after_days or conf.logic.archive_after_days
+    batch = batch or conf.logic.archive_batch
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=after_days)
+    total = 0
+    while True:
+        async with AsyncSession() as session:
+            result = await session.execute(ARCHIVE_BATCH_SQL, {'cutoff': cutoff, 'batch': batch})
+            await session.commit()
+        total += result.rowcount
+        if result.rowcount < batch:
+            break
+    logger.info(f'В архив перенесено заказов: {total}')
+    return total
+
+
+async def find_order(order_id: int) -> Order | OrderArchive | None:
+    """Заказ по id для разбора споров: сначала рабочая таблица, затем архив"""
+    async with AsyncSession() as session:
+        for model in (Order, OrderArchive):
+            order = (await session.execute(select(model).where(model.id == order_id))).scalars().one_or_none()
+            if order:
+                return order
+    return None
@@ -0,0 +1,36 @@
+import hashlib
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from config_data.bot_conf import get_my_loggers
+from database.db import AsyncSession, Blob
+
+logger, err_log = get_my_loggers()
+
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+async def save_blob(data: bytes) -> str:
+    """
+    Сохраняет данные в blobs и возвращает ключ.
+    Одинаковое содержимое хранится один раз
+    """
+    key = blob_key(data)
+    async with AsyncSession() as session:
+        q = insert(Blob).values(key=key, data=data, size=len(data)).on_conflict_do_nothing(index_elements=['key'])
+        await session.execute(q)
+        await session.commit()
+    logger.debug(f'Сохранен blob {key} ({len(data)} байт)')
+    return key
+
+
+async def load_blob(key: str) -> bytes | None:
+    """Данные по ключу. Читается только при отправке фото"""
+    if not key:
+        return None
+    async with AsyncSession() as session:
+        q = select(Blob.data).where(Blob.key == key)
+        return (await session.execute(q)).scalar_one_or_none()
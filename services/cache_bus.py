@@ -0,0 +1,62 @@
+"""
+Сброс локальных кэшей во всех процессах бота через Redis pub/sub.
+Процесс, изменивший данные, публикует имя кэша, остальные его сбрасывают.
+"""
+import asyncio
+import os
+
+from config_data.bot_conf import get_my_loggers
+from database.redis_db import redis
+
+logger, err_log = get_my_loggers()
+
+CHANNEL = 'bot:cache_invalidate'
+
+_handlers = {}
+
+
+def on_invalidate(name: str):
+    """Регистрирует функцию сброса кэша name, функция получает аргумент сообщения"""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def worker_id() -> str:
+    """
+    Свои сообщения пропускаем: локальный кэш уже обновлен.
+    pid читается при каждом вызове - воркеры, созданные fork, получают свой
+    """
+    return f'{os.getpid()}'
+
+
+async def publish(name: str, arg: str = ''):
+    if redis is None:
+        return
+    try:
+        await redis.publish(CHANNEL, f'{worker_id()}:{name}:{arg}')
+    except Exception as err:
+        err_log.error(f'Не отправлен сброс кэша {name}: {err}')
+
+
+async def listen():
+    """Фоновая задача процесса: слушает канал сброса кэшей"""
+    if redis is None:
+        return
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    worker, name, arg = message['data'].decode().split(':', 2)
+                    handler = _handlers.get(name)
+                    if worker != worker_id() and handler:
+                        handler(arg)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            err_log.error(f'Канал сброса кэшей: {err}')
+            await asyncio.sleep(5)
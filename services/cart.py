@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, raiseload
+
+from config_data.bot_conf import get_my_loggers
+from database.db import AsyncSession, User, Order
+from services.func import get_prices
+from services.pricing import PriceSnapshot
+from services.settings import settings_cache, SettingsSnapshot
+
+logger, err_log = get_my_loggers()
+
+
+@dataclass
+class CartSnapshot:
+    """
+    Корзина пользователя: заказы с товарами и параметры расчета.
+    Загружается одним запросом, текст, кнопки и итог считаются в памяти
+    """
+    user: User
+    orders: Sequence[Order]
+    settings: SettingsSnapshot
+    prices: PriceSnapshot | None
+
+    @property
+    def total_cost(self) -> Decimal:
+        if not self.orders:
+            return Decimal(0)
+        return self.prices.cart_total(((order.cost, order.item_id) for order in self.orders),
+                                      bool(self.user.is_newbie))
+
+    def text(self) -> str:
+        """
+        Формирование текста Инфо о корзине
+        """
+        if not self.orders:
+            return 'Ваша корзина пуста'
+        text = f'Итоговая стоимость: {self.total_cost}\n\n'
+        for num, order in enumerate(self.orders, 1):
+            text += f'{num}. {order.item.name}\n'
+            text += f'{order.link}\n'
+            text += f'Размер: {order.size}\n'
+            text += f'Стоимость: {order.cost}\n'
+            text += f'Доставка: {order.item.shipping}\n'
+            text += f'Номер: {order.id}\n\n'
+        text += f'Доставка по адресу:\n{self.user.address}\n'
+        text += f'Фио получателя:\n{self.user.fio}\n'
+        text += f'Номер получателя:\n{self.user.phone}\n\n'
+        text += f'Реквизиты для оплаты:\n{self.settings.pay_req}\n\n'
+        text += 'После оплаты пришите чек'
+        return text
+
+    def delete_buttons(self) -> dict:
+        """
+        Кнопки для удаления из корзины
+        """
+        buttons = {}
+        for num, order in enumerate(self.orders, 1):
+            buttons[f'{num}. Номер {order.id}'] = f'cartdel_{order.id}'
+        return buttons
+
+
+async def load_cart(user: User) -> CartSnapshot:
+    """Один запрос к orders+items, настройки и курс берутся из кэша"""
+    async with AsyncSession() as session:
+        q = (select(Order)
+             .where(Order.user_id == user.id).where(Order.status == 'temp')
+             .options(joinedload(Order.item), raiseload(Order.user))
+             .order_by(Order.id))
+        orders = (await session.execute(q)).scalars().all()
+    settings = await settings_cache.snapshot()
+    prices = await get_prices() if orders else None
+    logger.debug(f'Корзина {user}: {len(orders)} заказов')
+    return CartSnapshot(user=user, orders=orders, settings=settings, prices=prices)
+
+
+async def get_bucket_text(user: User) -> str:
+    return (await load_cart(user)).text()
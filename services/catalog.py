@@ -0,0 +1,100 @@
+import asyncio
+
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import select, event
+
+from config_data.bot_conf import get_my_loggers
+from database.db import AsyncSession, Item, Faq
+from services.cache_bus import on_invalidate, publish
+from keyboards.keyboards import custom_kb
+
+logger, err_log = get_my_loggers()
+
+
+class CatalogCache:
+    """
+    Товары и FAQ в памяти: готовые клавиатуры и словари id -> запись.
+    Каталог меняется редко, поэтому кэш живет до явного invalidate()
+    """
+
+    def __init__(self):
+        self.items: dict[int, Item] = {}
+        self.faqs: dict[int, Faq] = {}
+        self._item_kb: InlineKeyboardMarkup | None = None
+        self._faq_kb: InlineKeyboardMarkup | None = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        async with AsyncSession() as session:
+            items = (await session.execute(select(Item).order_by(Item.id))).scalars().all()
+            faqs = (await session.execute(select(Faq).order_by(Faq.id))).scalars().all()
+        self.items = {item.id: item for item in items}
+        self.faqs = {faq.id: faq for faq in faqs}
+        item_btn = {f'{item.name} (Доставка {item.shipping})': f'item_{item.id}' for item in items}
+        faq_btn = {f'{faq.question}': f'answer_{faq.id}' for faq in faqs}
+        faq_btn['Назад'] = 'menu'
+        self._item_kb = custom_kb(1, item_btn)
+        self._faq_kb = custom_kb(1, faq_btn)
+        self._loaded = True
+        logger.debug(f'Каталог загружен: {len(self.items)} товаров, {len(self.faqs)} вопросов')
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self.load()
+
+    async def item_menu(self) -> InlineKeyboardMarkup:
+        await self._ensure_loaded()
+        return self._item_kb
+
+    async def faq_menu(self) -> InlineKeyboardMarkup:
+        await self._ensure_loaded()
+        return self._faq_kb
+
+    async def get_items(self) -> dict[int, Item]:
+        await self._ensure_loaded()
+        return self.items
+
+    async def get_item(self, item_id: int) -> Item | None:
+        await self._ensure_loaded()
+        return self.items.get(item_id)
+
+    async def get_faq(self, faq_id: int) -> Faq | None:
+        await self._ensure_loaded()
+        return self.faqs.get(faq_id)
+
+    def invalidate(self):
+        self._loaded = False
+        logger.debug('Кэш каталога сброшен')
+
+
+catalog = CatalogCache()
+
+
+@on_invalidate('catalog')
+def _reset_catalog(arg: str):
+    catalog.invalidate()
+
+
+# Ссылки на задачи публикации, иначе их может собрать GC до завершения
+_publish_tasks: set[asyncio.Task] = set()
+
+
+def _on_catalog_change(mapper, connection, target):
+    catalog.invalidate()
+    try:
+        task = asyncio.get_running_loop().create_task(publish('catalog'))
+    except RuntimeError:
+        # Изменение вне event loop (скрипты), другим процессам сообщит /reload
+        return
+    _publish_tasks.add(task)
+    task.add_done_callback(_publish_tasks.discard)
+
+
+# Любое изменение товаров или FAQ через ORM сбрасывает кэш
+for _model in (Item, Faq):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _on_catalog_change)
@@ -1,11 +1,119 @@
-import requests
+import asyncio
+import time
+from typing import Awaitable, Callable
 
+import aiohttp
 
-def get_currency_cny():
-    resp = requests.get('https://www.cbr-xml-daily.ru/daily_json.js', timeout=5)
-    if resp.status_code == 200:
-        data = resp.json()
-        currency = data.get('Valute')
-        cny = currency.get('CNY')
-        value = cny.get('Value')
-        return float(value)
+from config_data.bot_conf import conf, get_my_loggers
+
+logger, err_log = get_my_loggers()
+
+CBR_URL = 'https://www.cbr-xml-daily.ru/daily_json.js'
+
+
+class CircuitOpenError(Exception):
+    """Источник курса недоступен, запросы временно не отправляются"""
+
+
+class CurrencyFetcher:
+    """
+    Асинхронное получение курса CNY с cbr-xml-daily.
+    Одновременные вызовы делят один запрос (single-flight).
+    После failure_threshold ошибок подряд запросы не отправляются
+    backoff секунд, backoff растет вдвое до max_backoff.
+    """
+
+    def __init__(self, url: str = CBR_URL, timeout: float = 5,
+                 failure_threshold: int = 3, backoff: float = 60, max_backoff: float = 3600):
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._failures = 0
+        self._open_until = 0.0
+        self._inflight: asyncio.Task | None = None
+        self._refresh: asyncio.Task | None = None
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    async def _request(self) -> float:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        async with self._session.get(self.url) as resp:
+            resp.raise_for_status()
+            # ЦБ отдает application/javascript
+            data = await resp.json(content_type=None)
+        return float(data['Valute']['CNY']['Value'])
+
+    def _on_success(self):
+        self._failures = 0
+        self._open_until = 0.0
+
+    def _on_failure(self, err: Exception):
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            delay = min(self.backoff * 2 ** (self._failures - self.failure_threshold), self.max_backoff)
+            self._open_until = time.monotonic() + delay
+            err_log.error(f'Курс недоступен ({err}), пауза {delay} сек')
+        else:
+            err_log.error(f'Ошибка получения курса: {err}')
+
+    async def _fetch_once(self) -> float:
+        try:
+            cny = await self._request()
+        except Exception as err:
+            self._on_failure(err)
+            raise
+        self._on_success()
+        return cny
+
+    async def fetch(self) -> float:
+        """Курс CNY. Параллельные вызовы ждут один и тот же запрос"""
+        if self._inflight is None:
+            if self.is_open:
+                raise CircuitOpenError(self.url)
+            self._inflight = asyncio.create_task(self._fetch_once())
+            self._inflight.add_done_callback(self._clear_inflight)
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, task: asyncio.Task):
+        self._inflight = None
+        if not task.cancelled():
+            # исключение уже залогировано в _on_failure
+            task.exception()
+
+    def refresh_in_background(self, on_success: Callable[[float], Awaitable]):
+        """
+        Обновление курса в фоне, без ожидания.
+        Ничего не делает, если обновление уже идет или цепь разомкнута.
+        """
+        if self._refresh is not None or self.is_open:
+            return
+
+        async def _refresh():
+            try:
+                try:
+                    cny = await self.fetch()
+                except Exception:
+                    # ошибка запроса уже залогирована в _on_failure
+                    return
+                try:
+                    await on_success(cny)
+                except Exception as err:
+                    err_log.error(f'Курс {cny} получен, но не сохранен: {err}')
+            finally:
+                self._refresh = None
+
+        self._refresh = asyncio.create_task(_refresh())
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+currency_fetcher = CurrencyFetcher(url=conf.logic.currency_url)
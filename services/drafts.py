@@ -0,0 +1,37 @@
+from dataclasses import dataclass, asdict, fields
+
+from database.db import Order
+from services.media import MediaRef
+
+
+@dataclass
+class OrderDraft:
+    """
+    Черновик заказа в данных FSM.
+    Хранит только id, текстовые поля и ссылку на фото - без ORM и байтов
+    """
+    item_id: int
+    link: str | None = None
+    size: str | None = None
+    cost: float | None = None
+    photo_file_id: str | None = None
+    photo_file_unique_id: str | None = None
+    photo_key: str | None = None
+    photo_thumb_key: str | None = None
+
+    def set_photo(self, photo: MediaRef):
+        self.photo_file_id = photo.file_id
+        self.photo_file_unique_id = photo.file_unique_id
+        self.photo_key = photo.blob_key
+        self.photo_thumb_key = photo.thumb_key
+
+    def to_state(self) -> dict:
+        return {key: val for key, val in asdict(self).items() if val is not None}
+
+    @classmethod
+    def from_state(cls, data: dict) -> 'OrderDraft':
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: val for key, val in data.items() if key in names})
+
+    def to_order(self, user_id: int) -> Order:
+        return Order(user_id=user_id, **asdict(self))
@@ -1,61 +1,72 @@
 import asyncio
 import datetime
-import math
+from collections import defaultdict
+from decimal import Decimal
 from typing import Sequence
 
 from aiogram import Bot
-from aiogram.types import BufferedInputFile, InputMediaPhoto
-from sqlalchemy import select, delete
-
-from config_data.bot_conf import get_my_loggers
-from database.db import Session, User, Order, BotSettings, Faq, Item
-from services.currency import get_currency_cny
+from aiogram.types import InputMediaPhoto
+from sqlalchemy import select, delete, update
+from sqlalchemy.dialects.postgresql import insert
+
+from config_data.bot_conf import conf, get_my_loggers
+from database.db import AsyncSession, User, Order, OrderArchive, BotSettings, Item
+from services.archive import find_order
+from services.media import MediaRef, input_photo
+from services.cache_bus import on_invalidate, publish
+from services.catalog import catalog
+from services.currency import currency_fetcher
+from services.lru import LRUCache
+from services.order_status import save_manager_messages, StatusChange
+from services.pricing import pricing, PriceSnapshot
+from services.settings import settings_cache
+from services.throttle import bulk_priority
 
 logger, err_log = get_my_loggers()
 
+# User по tg_id, сбрасывается в update_user
+user_cache = LRUCache(maxsize=conf.logic.user_cache_size)
+
 
-def check_user(id):
-    """Возвращает найденных пользователей по tg_id"""
-    # logger.debug(f'Ищем юзера {id}')
-    with Session() as session:
-        user: User = session.query(User).filter(User.tg_id == str(id)).first()
-        # logger.debug(f'Результат: {user}')
-        return user
+@on_invalidate('user')
+def _reset_user(tg_id: str):
+    user_cache.pop(tg_id)
 
 
-def get_or_create_user(user) -> User:
-    """Из юзера ТГ возвращает сущестующего User ли создает его"""
+async def get_or_create_user(user) -> User:
+    """
+    Из юзера ТГ возвращает сущестующего User ли создает его.
+    Один запрос INSERT ... ON CONFLICT DO UPDATE, повторно - из user_cache
+    """
     try:
-        tg_id = user.id
+        tg_id = str(user.id)
         username = user.username
-        # logger.debug(f'username {username}')
-        old_user = check_user(tg_id)
-        if old_user:
-            # logger.debug('Пользователь есть в базе')
-            return old_user
-        # logger.debug('Добавляем пользователя')
-        with Session() as session:
-            new_user = User(tg_id=tg_id,
-                            username=username,
-                            register_date=datetime.datetime.now()
-                            )
-            session.add(new_user)
-            session.commit()
-            logger.debug(f'Пользователь создан: {new_user}')
-        return new_user
+        cached: User = user_cache.get(tg_id)
+        if cached and cached.username == username:
+            return cached
+        async with AsyncSession() as session:
+            q = (insert(User)
+                 .values(tg_id=tg_id, username=username, register_date=datetime.datetime.now(), is_newbie=1)
+                 .on_conflict_do_update(index_elements=[User.tg_id], set_={'username': username})
+                 .returning(User))
+            db_user: User = (await session.scalars(q, execution_options={'populate_existing': True})).one()
+            await session.commit()
+        user_cache.set(tg_id, db_user)
+        return db_user
     except Exception as err:
         err_log.error('Пользователь не создан', exc_info=True)
 
 
-def update_user(user: User, data: dict):
+async def update_user(user: User, data: dict):
     try:
         logger.debug(f'Обновляем {user}: {data}')
-        session = Session()
-        with session:
-            user: User = session.query(User).filter(User.id == user.id).first()
+        async with AsyncSession() as session:
+            user: User = await session.get(User, user.id)
             for key, val in data.items():
                 setattr(user, key, val)
-            session.commit()
+            await session.commit()
+            user_cache.pop(user.tg_id)
+            await publish('user', user.tg_id)
             logger.debug(f'Юзер обновлен {user}')
     except Exception as err:
         err_log.error(f'Ошибка обновления юзера {user}: {err}')
@@ -70,162 +81,79 @@ def get_order_confirm_text(order: Order) -> str:
     return msg
 
 
-def read_bot_settings(name: str) -> str:
-    session = Session()
-    with session:
-        q = select(BotSettings).where(BotSettings.name == name).limit(1)
-        result = session.execute(q).scalars().one_or_none()
-    return result.value
+async def read_bot_settings(name: str) -> str:
+    """Значение настройки из кэша settings_cache"""
+    return await settings_cache.get(name)
 
 
-def save_bot_settings(name: str, value):
+async def save_bot_settings(name: str, value):
     try:
-        session = Session()
-        with session:
+        async with AsyncSession() as session:
             q = select(BotSettings).where(BotSettings.name == name).limit(1)
-            option = session.execute(q).scalars().one_or_none()
+            option = (await session.execute(q)).scalars().one_or_none()
             option.value = str(value)
-            session.commit()
+            await session.commit()
+            settings_cache.set(name, option.value)
+            await publish('settings')
             logger.debug(f'Обновлено {name} на {value}')
             return True
     except Exception as err:
         logger.debug(f'Ошибка при сохранении {name}')
 
 
-def update_currency(cny):
-    save_bot_settings('cny_currency', cny)
-    save_bot_settings('currency_last_update', datetime.datetime.now())
+async def update_currency(cny):
+    await save_bot_settings('cny_currency', cny)
+    await save_bot_settings('currency_last_update', datetime.datetime.now())
 
 
-def get_cny_to_rub():
-    """
-    Возврщает курс для расчета.
-    Если курс не обовлялся более суток, то обновляется
-    """
-    try:
-        last_update = read_bot_settings('currency_last_update')
-        delta = datetime.datetime.now() - datetime.datetime.fromisoformat(last_update)
-        if delta.days <= 0:
-            cny = float(read_bot_settings('cny_currency'))
-        else:
-            cny = get_currency_cny()
-            update_currency(cny)
-        cny = cny + 0.5
-        cny = cny * 10
-        cny = math.ceil(cny)
-        cny = cny / 10
-        return cny
-    except Exception as err:
-        err_log.error(f'ошибка при обновлении курса: {err}')
+async def refresh_currency_rate() -> float:
+    """Запрашивает курс у ЦБ и сохраняет его"""
+    cny = await currency_fetcher.fetch()
+    await update_currency(cny)
+    return cny
 
 
-def get_tax(user: User) -> int:
-    tax1 = int(read_bot_settings('tax1'))
-    tax2 = int(read_bot_settings('tax2'))
-    return tax1 if user.is_newbie else tax2
-
-
-def calc_cost(user, cost, shipping) -> float:
+async def get_prices() -> PriceSnapshot:
     """
-    Расчет calc
+    Снимок цен.
+    Если курс не обовлялся более суток, то отдается последний сохраненный,
+    а обновление запускается в фоне
     """
-    total_cost = 0
-    tax = get_tax(user)
-    rub_cny = get_cny_to_rub()
-    total_cost += cost * rub_cny * 1.01
-    total_cost += shipping
-    total_cost += tax
-    return round(total_cost, 2)
+    prices = await pricing.snapshot()
+    if prices.rate_is_stale:
+        currency_fetcher.refresh_in_background(update_currency)
+    return prices
 
 
-def get_total_cost(user: User) -> float:
-    """
-    Расчет стоимости корзины
-    """
-    session = Session()
-    with session:
-        q = select(Order).where(Order.user_id == user.id).where(Order.status == 'temp')
-        orders: Sequence = session.execute(q).scalars().all()
-        if not orders:
-            return 0
-        rub_cny = get_cny_to_rub()
-        tax = get_tax(user)
-        total_cost = 0
-        for order in orders:
-            total_cost += order.cost * rub_cny * 1.01
-            shipping = order.item.shipping
-            total_cost += shipping
-            total_cost += tax
-        return round(total_cost, 2)
-
-
-def get_bucket_text(user: User) -> str:
-    """
-    Формирование текста Инфо о корзине
-    """
-    session = Session()
-    with session:
-        q = select(Order).where(Order.user_id == user.id).where(Order.status == 'temp')
-        orders = session.execute(q).scalars().all()
-        logger.debug(f'Заказы {user}: {orders}')
-        pay_req = read_bot_settings('pay_req')
-        if orders:
-            total_cost = get_total_cost(user)
-            text = f'Итоговая стоимость: {total_cost}\n\n'
-            for num, order in enumerate(orders, 1):
-                text += f'{num}. {order.item.name}\n'
-                text += f'{order.link}\n'
-                text += f'Размер: {order.size}\n'
-                text += f'Стоимость: {order.cost}\n'
-                text += f'Доставка: {order.item.shipping}\n'
-                text += f'Номер: {order.id}\n\n'
-            text += f'Доставка по адресу:\n{user.address}\n'
-            text += f'Фио получателя:\n{user.fio}\n'
-            text += f'Номер получателя:\n{user.phone}\n\n'
-            text += f'Реквизиты для оплаты:\n{pay_req}\n\n'
-            text += 'После оплаты пришите чек'
-            return text
-        else:
-            text = 'Ваша корзина пуста'
-            return text
-
-
-def get_cart_delete_kb_btn(user: User) -> dict:
+async def calc_cost(user, cost, item_id) -> Decimal:
     """
-    Кнопки для удаления из корзины
+    Расчет calc
     """
-    session = Session()
-    with session:
-        q = select(Order).where(Order.user_id == user.id).where(Order.status == 'temp')
-        orders = session.execute(q).scalars().all()
-        buttons = {}
-        for num, order in enumerate(orders, 1):
-            buttons[f'{num}. Номер {order.id}'] = f'cartdel_{order.id}'
-        return buttons
+    prices = await get_prices()
+    return prices.price(cost, item_id, bool(user.is_newbie))
 
 
-def delete_order(pk):
+async def delete_order(pk):
     try:
-        session = Session()
-        with session:
+        async with AsyncSession() as session:
             q = delete(Order).where(Order.id == pk)
-            session.execute(q)
-            session.commit()
+            await session.execute(q)
+            await session.commit()
             logger.debug(f'Заказ {pk} удален')
     except Exception as err:
         logger.error(f'Ошибка при удалении заказа {pk}: {err}')
 
 
-def update_pay_confirm(user: User, pay):
+async def update_pay_confirm(user: User, pay: MediaRef):
     logger.debug('Сохраняем чек')
-    session = Session()
-    with session:
-        q = select(Order).where(Order.user_id == user.id).where(Order.status == 'temp')
-        orders: Sequence = session.execute(q).scalars().all()
-        for order in orders:
-            order.pay_confirm = pay
-            order.pay_date = datetime.datetime.now()
-        session.commit()
+    async with AsyncSession() as session:
+        q = (update(Order).where(Order.user_id == user.id).where(Order.status == 'temp')
+             .values(pay_confirm_key=pay.blob_key,
+                     pay_confirm_file_id=pay.file_id,
+                     pay_confirm_file_unique_id=pay.file_unique_id,
+                     pay_date=datetime.datetime.now()))
+        await session.execute(q)
+        await session.commit()
         logger.debug('Чек сохранен')
 
 
@@ -246,106 +174,108 @@ def get_manager_order_text(user: User, order: Order) -> str:
     return text
 
 
-async def send_orders_to_manager(user, bot: Bot):
-    """
-    Отправка менеджеру. Смена статуса.
-    """
-    try:
-        logger.debug('Отправка менеджеру')
-        session = Session()
-        with session:
-            q = select(Order).where(Order.user_id == user.id).where(Order.status == 'temp')
-            orders: Sequence = session.execute(q).scalars().all()
-            order_ids = []
-            manager_id = read_bot_settings('manager_id')
-            if orders:
-                for num, order in enumerate(orders):
-                    try:
-                        item_photo = order.photo
-                        photo = BufferedInputFile(item_photo, filename='item_photo_name')
-                        order_text = get_manager_order_text(user, order)
-                        msg = await bot.send_photo(chat_id=manager_id, photo=photo, caption=order_text)
-                        order_ids.append(order.id)
-                        order.status = 'payed'
-                        order.manager_msg_id = msg.message_id
-                        session.commit()
-                        logger.debug(f'Сообщение {msg.message_id}')
-                    except Exception as err:
-                        logger.error(err)
-                pay_photo = BufferedInputFile(order.pay_confirm, filename='pay_photo_name')
-                pay_caption = f'Платеж к заказам {order_ids}'
-                await bot.send_photo(chat_id=manager_id, photo=pay_photo, caption=pay_caption)
-    except Exception as err:
-        raise err
+MEDIA_GROUP_SIZE = 10
 
 
-def get_order(order_id) -> Order:
-    """
-    Возвращает Order по id
-    """
-    session = Session()
-    with session:
-        q = select(Order).where(Order.id == order_id)
-        order = session.execute(q).scalars().one_or_none()
-        logger.debug(f'Найден заказ {order}')
-        return order
+async def send_media(bot: Bot, chat_id, media: list[InputMediaPhoto]) -> list[int]:
+    """Отправляет до 10 фото одним сообщением, возвращает id сообщений по порядку"""
+    if len(media) == 1:
+        msg = await bot.send_photo(chat_id=chat_id, photo=media[0].media, caption=media[0].caption)
+        return [msg.message_id]
+    msgs = await bot.send_media_group(chat_id=chat_id, media=media)
+    return [msg.message_id for msg in msgs]
 
 
-def get_item(item_id) -> Item:
+async def send_orders_to_manager(user, bot: Bot, orders: Sequence[Order]):
     """
-    Возвращает Item по id
+    Отправка менеджеру оплаченных заказов (claim_payed) альбомами по 10 фото, последним идет чек.
+    Соединение с базой на время отправки не держится,
+    id сообщений сохраняются короткой транзакцией после отправки.
     """
-    session = Session()
-    with session:
-        q = select(Item).where(Item.id == item_id)
-        item = session.execute(q).scalars().one_or_none()
-        return item
-
-
-def cancel_order(order_id) -> bool:
+    logger.debug('Отправка менеджеру')
+    if not orders:
+        return
+    manager_id = await read_bot_settings('manager_id')
+    order_ids = [order.id for order in orders]
+    media = []
+    for order in orders:
+        photo = await input_photo(order.photo_file_id, order.photo_key, 'item_photo_name', order.photo_thumb_key)
+        media.append(InputMediaPhoto(media=photo, caption=get_manager_order_text(user, order)))
+    pay_order = orders[-1]
+    pay_photo = await input_photo(pay_order.pay_confirm_file_id, pay_order.pay_confirm_key, 'pay_photo_name')
+    media.append(InputMediaPhoto(media=pay_photo, caption=f'Платеж к заказам {order_ids}'))
+
+    sent = {}
+    for start in range(0, len(media), MEDIA_GROUP_SIZE):
+        chunk_orders = orders[start:start + MEDIA_GROUP_SIZE]
+        try:
+            with bulk_priority():
+                msg_ids = await send_media(bot, manager_id, media[start:start + MEDIA_GROUP_SIZE])
+        except Exception as err:
+            err_log.error(f'Заказы {[order.id for order in chunk_orders]} не отправлены менеджеру: {err}')
+            continue
+        # zip отбрасывает id сообщения с чеком
+        for order, msg_id in zip(chunk_orders, msg_ids):
+            sent[order.id] = msg_id
+    await save_manager_messages(sent)
+    logger.debug(f'Заказы {order_ids} отправлены менеджеру')
+
+
+# Сколько сообщений удаляем параллельно: в aiogram 3.1 нет deleteMessages
+DELETE_CHUNK_SIZE = 20
+
+
+async def notify_buyers(bot: Bot, changes: Sequence[StatusChange], title: str, footer: str = ''):
+    """Одно сообщение покупателю на все его заказы из массовой операции"""
+    by_user = defaultdict(list)
+    for change in changes:
+        by_user[change.tg_id].append(change.order_id)
+    with bulk_priority():
+        results = await asyncio.gather(
+            *(bot.send_message(chat_id=tg_id, text=f'{title}: {", ".join(map(str, order_ids))}\n\n{footer}'.strip())
+              for tg_id, order_ids in by_user.items()),
+            return_exceptions=True)
+    for tg_id, result in zip(by_user, results):
+        if isinstance(result, Exception):
+            err_log.error(f'Не отправлено уведомление {tg_id}: {result}')
+
+
+async def delete_messages(bot: Bot, chat_id, msg_ids: Sequence[int]):
+    """Удаление сообщений пачками, внутри пачки запросы идут параллельно"""
+    for start in range(0, len(msg_ids), DELETE_CHUNK_SIZE):
+        chunk = msg_ids[start:start + DELETE_CHUNK_SIZE]
+        with bulk_priority():
+            results = await asyncio.gather(
+                *(bot.delete_message(chat_id=chat_id, message_id=msg_id) for msg_id in chunk),
+                return_exceptions=True)
+        for msg_id, result in zip(chunk, results):
+            if isinstance(result, Exception):
+                err_log.warning(f'Сообщение {msg_id} не удалено: {result}')
+
+
+async def get_order(order_id) -> Order | OrderArchive | None:
     """
-    Меняет статус заказа на отмененный
+    Возвращает заказ по id, в том числе из архива
     """
-    session = Session()
-    with session:
-        q = select(Order).where(Order.id == order_id)
-        order = session.execute(q).scalars().one_or_none()
-        if order:
-            order.status = 'canceled'
-            session.commit()
-            logger.debug(f'Статус заказа {order} изменен на "canceled"')
-            return True
-        return False
+    order = await find_order(order_id)
+    logger.debug(f'Найден заказ {order}')
+    return order
 
 
-def order_buy(order_id) -> bool:
+async def get_item(item_id) -> Item:
     """
-    Меняет статус заказа на купленный
+    Возвращает Item по id
     """
-    session = Session()
-    with session:
-        q = select(Order).where(Order.id == order_id)
-        order = session.execute(q).scalars().one_or_none()
-        if order:
-            order.status = 'buyed'
-            session.commit()
-            logger.debug(f'Статус заказа {order} изменен на "buyed"')
-            return True
-        return False
+    return await catalog.get_item(item_id)
 
 
-def get_order_from_msg(msg_id):
-    session = Session()
-    with session:
+async def get_order_from_msg(msg_id):
+    async with AsyncSession() as session:
         q = select(Order).where(Order.manager_msg_id == msg_id)
-        order = session.execute(q).scalars().one_or_none()
+        order = (await session.execute(q)).scalars().one_or_none()
         logger.debug(f'Найден заказ {order}')
         return order
 
 
-def get_faq(faq_id):
-    session = Session()
-    with session:
-        q = select(Faq).where(Faq.id == faq_id)
-        faq = session.execute(q).scalars().one_or_none()
-        return faq
\ No newline at end of file
+async def get_faq(faq_id):
+    return await catalog.get_faq(faq_id)
@@ -0,0 +1,86 @@
+"""
+Обработка фото в отдельных процессах: сжатие, ограничение размера,
+удаление метаданных и превью для менеджера.
+ImageMagick (Wand) держит GIL и CPU, поэтому event loop его не видит.
+"""
+import asyncio
+import concurrent.futures
+import multiprocessing
+from dataclasses import dataclass
+
+from config_data.bot_conf import conf, get_my_loggers
+
+logger, err_log = get_my_loggers()
+
+
+@dataclass(frozen=True)
+class ProcessedImage:
+    data: bytes
+    thumb: bytes | None
+    width: int
+    height: int
+    source_size: int
+
+
+def process_image(data: bytes, max_side: int, quality: int, thumb_side: int = 0) -> ProcessedImage:
+    """
+    Выполняется в дочернем процессе, поэтому функция модульная и без состояния.
+    Результат всегда перекодирован: без EXIF/GPS и не больше max_side.
+    thumb_side=0 - без превью
+    """
+    # ImageMagick нужен только в режиме blob и только в процессах пула
+    from wand.image import Image
+
+    with Image(blob=data) as img:
+        img.auto_orient()
+        img.strip()
+        # '>' - только уменьшать
+        img.transform(resize=f'{max_side}x{max_side}>')
+        img.format = 'jpeg'
+        img.compression_quality = quality
+        result = img.make_blob()
+        width, height = img.width, img.height
+        thumb = None
+        if thumb_side:
+            with img.clone() as preview:
+                preview.transform(resize=f'{thumb_side}x{thumb_side}>')
+                preview.compression_quality = min(quality, 70)
+                thumb = preview.make_blob()
+    return ProcessedImage(data=result, thumb=thumb, width=width, height=height, source_size=len(data))
+
+
+class ImagePool:
+    """
+    Пул процессов с ограниченной очередью:
+    не больше 2 * workers задач ждут или выполняются одновременно
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: concurrent.futures.ProcessPoolExecutor | None = None
+        self._slots = asyncio.Semaphore(workers * 2)
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: при fork дочерний процесс копирует состояние потоков QueueListener и Redis
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def normalize(self, data: bytes, thumbnail: bool = False) -> ProcessedImage:
+        thumb_side = conf.logic.thumb_side if thumbnail else 0
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            image = await loop.run_in_executor(
+                self._get_executor(), process_image,
+                data, conf.logic.image_max_side, conf.logic.image_quality, thumb_side)
+        logger.debug(f'Фото {image.width}x{image.height}: {image.source_size} -> {len(image.data)} байт')
+        return image
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImagePool(workers=conf.logic.image_workers)
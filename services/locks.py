@@ -0,0 +1,70 @@
+import asyncio
+import contextlib
+import zlib
+
+from redis.exceptions import LockError
+from sqlalchemy import text
+
+from config_data.bot_conf import get_my_loggers
+from database.db import get_lock_engine
+from database.redis_db import redis
+
+logger, err_log = get_my_loggers()
+
+
+class LockNotAcquired(Exception):
+    """Ресурс занят другим процессом"""
+
+
+@contextlib.asynccontextmanager
+async def _redis_lock(name: str, timeout: float, wait: float):
+    lock = redis.lock(f'lock:{name}', timeout=timeout, blocking=wait > 0, blocking_timeout=wait or None)
+    if not await lock.acquire():
+        raise LockNotAcquired(name)
+    try:
+        yield
+    finally:
+        try:
+            await lock.release()
+        except LockError:
+            # Истек timeout, блокировку уже могли взять другие
+            err_log.error(f'Блокировка {name} истекла до освобождения')
+
+
+@contextlib.asynccontextmanager
+async def _pg_lock(name: str, wait: float):
+    """
+    Advisory lock Postgres уровня транзакции на соединении из пула блокировок.
+    Снимается при завершении транзакции, в том числе при ошибке
+    """
+    key = zlib.crc32(name.encode())
+    conn = get_lock_engine().connect()
+    try:
+        # Занятый пул блокировок - тоже "не удалось взять", а не ожидание без конца
+        await asyncio.wait_for(conn.start(), timeout=max(wait, 1))
+    except asyncio.TimeoutError:
+        raise LockNotAcquired(name)
+    try:
+        async with conn.begin():
+            if wait > 0:
+                # SET LOCAL действует до конца транзакции и не остается на соединении в пуле
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{int(wait * 1000)}ms'"))
+                try:
+                    await conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': key})
+                except Exception:
+                    raise LockNotAcquired(name)
+            elif not (await conn.execute(text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': key})).scalar():
+                raise LockNotAcquired(name)
+            yield
+    finally:
+        await conn.close()
+
+
+def distributed_lock(name: str, timeout: float = 60, wait: float = 10):
+    """
+    Блокировка, общая для всех процессов бота: Redis, если он настроен, иначе Postgres.
+    wait=0 - не ждать, сразу LockNotAcquired
+    """
+    if redis is not None:
+        return _redis_lock(name, timeout, wait)
+    return _pg_lock(name, wait)
@@ -0,0 +1,61 @@
+import io
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile, PhotoSize
+
+from config_data.bot_conf import conf, get_my_loggers
+from services.blobs import save_blob, load_blob
+from services.images import image_pool
+
+logger, err_log = get_my_loggers()
+
+
+@dataclass
+class MediaRef:
+    """Ссылка на фото: file_id телеграма и, в режиме blob, ключи фото и превью в blobs"""
+    file_id: str
+    file_unique_id: str
+    blob_key: str | None = None
+    thumb_key: str | None = None
+
+
+async def download_bytes(bot: Bot, file_id: str) -> bytes:
+    mem_photo = io.BytesIO()
+    await bot.download(file=file_id, destination=mem_photo)
+    return mem_photo.getvalue()
+
+
+async def store_photo(bot: Bot, photo: PhotoSize, thumbnail: bool = False) -> MediaRef:
+    """
+    Запоминает фото из сообщения.
+    В режиме file_id ничего не скачивается, в режиме blob в blobs сохраняется
+    обработанное фото и, если нужно, превью
+    """
+    ref = MediaRef(file_id=photo.file_id, file_unique_id=photo.file_unique_id)
+    if conf.logic.media_mode == 'blob':
+        data = await download_bytes(bot, photo.file_id)
+        try:
+            image = await image_pool.normalize(data, thumbnail=thumbnail)
+        except Exception as err:
+            # Сырые байты с EXIF не сохраняем, фото остается доступно по file_id
+            err_log.error(f'Фото {photo.file_unique_id} не обработано, сохранен только file_id: {err}')
+            return ref
+        ref.blob_key = await save_blob(image.data)
+        if image.thumb:
+            ref.thumb_key = await save_blob(image.thumb)
+    return ref
+
+
+async def input_photo(file_id: str | None, blob_key: str | None, filename: str = 'photo',
+                      thumb_key: str | None = None):
+    """
+    Фото для send_photo: по file_id без загрузки, иначе байты из blobs.
+    thumb_key - превью для менеджера: небольшая копия без метаданных важнее file_id
+    """
+    if thumb_key:
+        return BufferedInputFile(await load_blob(thumb_key), filename=filename)
+    if file_id:
+        return file_id
+    return BufferedInputFile(await load_blob(blob_key), filename=filename)
+
@@ -0,0 +1,143 @@
+"""
+Переходы статусов заказа: temp -> payed -> buyed, любой -> canceled.
+Каждый переход - один UPDATE ... WHERE status IN (...) RETURNING,
+повторный или недопустимый переход не найдет строку и вернет None.
+"""
+import datetime
+from dataclasses import dataclass
+from typing import Sequence
+
+from sqlalchemy import update, case
+
+from config_data.bot_conf import get_my_loggers
+from database.db import AsyncSession, Order, User
+
+logger, err_log = get_my_loggers()
+
+# Новый статус -> из каких статусов в него можно перейти
+TRANSITIONS = {
+    'payed': ('temp',),
+    'buyed': ('payed',),
+    'canceled': ('temp', 'payed', 'buyed'),
+}
+
+
+@dataclass(frozen=True)
+class StatusChange:
+    order_id: int
+    tg_id: str  # Покупатель, которому отправляем уведомление
+    manager_msg_id: int | None
+    status: str
+
+
+def transition_query(status: str, *criteria):
+    """
+    UPDATE orders ... FROM users с проверкой исходного статуса.
+    Через таблицы, а не модели: ORM-вариант в SQLAlchemy 2.0.23
+    теряет в RETURNING колонки второй таблицы (users.tg_id)
+    """
+    orders, users = Order.__table__, User.__table__
+    return (update(orders)
+            .where(orders.c.status.in_(TRANSITIONS[status]), orders.c.user_id == users.c.id, *criteria)
+            .values(status=status)
+            .returning(orders.c.id, users.c.tg_id, orders.c.manager_msg_id)
+            .execution_options(synchronize_session=False))
+
+
+async def change_status(order_id: int, status: str, manager_msg_id: int | None = None) -> StatusChange | None:
+    """
+    Переводит заказ в status.
+    manager_msg_id - дополнительно проверить, что менеджер ответил на сообщение этого заказа
+    """
+    criteria = [Order.id == order_id]
+    if manager_msg_id is not None:
+        criteria.append(Order.manager_msg_id == manager_msg_id)
+    async with AsyncSession() as session:
+        row = (await session.execute(transition_query(status, *criteria))).one_or_none()
+        await session.commit()
+    if row is None:
+        logger.debug(f'Заказ {order_id} не переведен в "{status}"')
+        return None
+    logger.debug(f'Статус заказа {order_id} изменен на "{status}"')
+    return StatusChange(order_id=row.id, tg_id=row.tg_id, manager_msg_id=row.manager_msg_id, status=status)
+
+
+async def claim_payed(order_ids: Sequence[int]) -> list[Order]:
+    """
+    temp -> payed для оплаченной корзины одним UPDATE ... RETURNING.
+    Возвращает только заказы, переведенные этим вызовом: повторный чек их уже не получит
+    """
+    if not order_ids:
+        return []
+    q = (update(Order)
+         .where(Order.id.in_(order_ids), Order.status.in_(TRANSITIONS['payed']))
+         .values(status='payed')
+         .returning(Order)
+         .execution_options(synchronize_session=False))
+    async with AsyncSession() as session:
+        orders = (await session.scalars(q)).all()
+        await session.commit()
+    return sorted(orders, key=lambda order: order.id)
+
+
+async def save_manager_messages(msg_ids: dict[int, int]):
+    """Id сообщений менеджеру одним UPDATE, msg_ids: id заказа -> id сообщения"""
+    if not msg_ids:
+        return
+    q = (update(Order)
+         .where(Order.id.in_(msg_ids))
+         .values(manager_msg_id=case(msg_ids, value=Order.id))
+         .execution_options(synchronize_session=False))
+    async with AsyncSession() as session:
+        await session.execute(q)
+        await session.commit()
+
+
+async def order_buy(order_id: int, manager_msg_id: int | None = None) -> StatusChange | None:
+    return await change_status(order_id, 'buyed', manager_msg_id)
+
+
+async def cancel_order(order_id: int, manager_msg_id: int | None = None) -> StatusChange | None:
+    return await change_status(order_id, 'canceled', manager_msg_id)
+
+
+async def change_status_many(status: str, *criteria) -> list[StatusChange]:
+    """Переводит в status все подходящие заказы одним UPDATE"""
+    async with AsyncSession() as session:
+        rows = (await session.execute(transition_query(status, *criteria))).all()
+        await session.commit()
+    logger.info(f'Статус {len(rows)} заказов изменен на "{status}"')
+    return [StatusChange(order_id=row.id, tg_id=row.tg_id, manager_msg_id=row.manager_msg_id, status=status)
+            for row in rows]
+
+
+def parse_order_ids(text: str) -> list[int]:
+    """'12,13,20-25' -> [12, 13, 20, 21, 22, 23, 24, 25]"""
+    order_ids = []
+    for part in text.replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(num) for num in part.split('-', 1))
+            if end < start or end - start > 1000:
+                raise ValueError(f'Неверный диапазон {part}')
+            order_ids.extend(range(start, end + 1))
+        else:
+            order_ids.append(int(part))
+    if not order_ids:
+        raise ValueError('Не указаны заказы')
+    return order_ids
+
+
+def parse_bulk_filter(text: str) -> list:
+    """
+    Условия отбора для массовой операции:
+    '12,13,20-25' - список и диапазоны id,
+    'payed before 2023-11-01' - все заказы в статусе, оплаченные до даты
+    """
+    words = text.split()
+    if len(words) == 3 and words[1] == 'before':
+        status, _, raw_date = words
+        pay_date = datetime.datetime.strptime(raw_date, '%Y-%m-%d')
+        return [Order.status == status, Order.pay_date < pay_date]
+    return [Order.id.in_(parse_order_ids(text))]
@@ -0,0 +1,128 @@
+"""
+Расчет цен в рублях по снимку курса, наценки, комиссий и доставки.
+Снимок неизменяемый и пересобирается только при смене настроек или каталога,
+все суммы считаются в Decimal.
+"""
+import datetime
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_HALF_UP
+from types import MappingProxyType
+from typing import Iterable, Mapping, Sequence
+
+from config_data.bot_conf import get_my_loggers
+from services.catalog import catalog
+from services.settings import settings_cache, SettingsSnapshot
+
+logger, err_log = get_my_loggers()
+
+MARKUP = Decimal('1.01')
+RATE_STEP = Decimal('0.1')
+CENT = Decimal('0.01')
+# Курс старше суток считается устаревшим
+RATE_MAX_AGE = datetime.timedelta(days=1)
+
+
+def to_decimal(value) -> Decimal:
+    # Через str: float 0.1 не превращается в 0.1000000000000000055...
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def parse_price(text: str) -> Decimal:
+    """Цена в юанях от пользователя: '199', '199.5' или '199,5'"""
+    try:
+        price = Decimal(text.strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f'Неверная цена: {text}')
+    if not price.is_finite() or price <= 0:
+        raise ValueError(f'Неверная цена: {text}')
+    return price
+
+
+def effective_rate(cny) -> Decimal:
+    """Курс ЦБ + 0.5 руб, округленный вверх до 0.1"""
+    return (to_decimal(cny) + Decimal('0.5')).quantize(RATE_STEP, rounding=ROUND_CEILING)
+
+
+def to_rub(amount: Decimal) -> Decimal:
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    rate: Decimal  # Курс для расчета, уже с +0.5 и округлением
+    markup: Decimal
+    tax_newbie: Decimal
+    tax_regular: Decimal
+    shipping: Mapping[int, Decimal]  # id товара -> доставка
+    rate_updated: datetime.datetime
+
+    @classmethod
+    def build(cls, settings: SettingsSnapshot, shipping: Mapping[int, int]) -> 'PriceSnapshot':
+        return cls(
+            rate=effective_rate(settings.cny_currency),
+            markup=MARKUP,
+            tax_newbie=to_decimal(settings.tax1),
+            tax_regular=to_decimal(settings.tax2),
+            shipping=MappingProxyType({item_id: to_decimal(cost) for item_id, cost in shipping.items()}),
+            rate_updated=settings.currency_last_update,
+        )
+
+    @property
+    def rate_is_stale(self) -> bool:
+        return datetime.datetime.now() - self.rate_updated > RATE_MAX_AGE
+
+    def tax(self, newbie: bool) -> Decimal:
+        return self.tax_newbie if newbie else self.tax_regular
+
+    def goods_cost(self, cost_cny) -> Decimal:
+        """Стоимость товара в рублях с наценкой, без доставки и комиссии"""
+        return to_decimal(cost_cny) * self.rate * self.markup
+
+    def price(self, cost_cny, item_id: int, newbie: bool) -> Decimal:
+        return to_rub(self.goods_cost(cost_cny) + self.shipping[item_id] + self.tax(newbie))
+
+    def cart_total(self, lines: Iterable[tuple], newbie: bool) -> Decimal:
+        """
+        Итог корзины за один проход, lines: (цена в юанях, id товара).
+        Округление один раз, на итоговой сумме
+        """
+        tax = self.tax(newbie)
+        total = Decimal(0)
+        for cost_cny, item_id in lines:
+            total += self.goods_cost(cost_cny) + self.shipping[item_id] + tax
+        return to_rub(total)
+
+    def price_table(self, yuan_prices: Sequence, newbie: bool = False) -> dict[int, list[Decimal]]:
+        """
+        Прайс для публикации: все товары x все цены в юанях.
+        Рублевая часть считается один раз на цену, доставка добавляется к готовому ряду
+        """
+        tax = self.tax(newbie)
+        base = [self.goods_cost(cost) + tax for cost in yuan_prices]
+        return {item_id: [to_rub(value + shipping) for value in base]
+                for item_id, shipping in self.shipping.items()}
+
+
+class PricingEngine:
+    """
+    Держит последний снимок цен.
+    Настройки и каталог отдают один и тот же объект, пока не изменились,
+    поэтому проверка актуальности - сравнение ссылок
+    """
+
+    def __init__(self):
+        self._snapshot: PriceSnapshot | None = None
+        self._settings: SettingsSnapshot | None = None
+        self._items: dict | None = None
+
+    async def snapshot(self) -> PriceSnapshot:
+        settings = await settings_cache.snapshot()
+        items = await catalog.get_items()
+        if self._snapshot is None or settings is not self._settings or items is not self._items:
+            self._snapshot = PriceSnapshot.build(settings, {item.id: item.shipping for item in items.values()})
+            self._settings, self._items = settings, items
+            logger.debug(f'Снимок цен пересобран: курс {self._snapshot.rate}')
+        return self._snapshot
+
+
+pricing = PricingEngine()
@@ -0,0 +1,174 @@
+"""
+Планировщик фоновых задач в event loop.
+Задачи лежат в куче по времени следующего запуска, цикл спит ровно до ближайшей.
+Время последнего запуска хранится в job_runs: после рестарта пропущенные
+запуски выполняются сразу. При нескольких процессах задачу выполняет один.
+"""
+import asyncio
+import datetime
+import heapq
+import itertools
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from config_data.bot_conf import get_my_loggers
+from database.db import AsyncSession, JobRun
+from services.locks import distributed_lock, LockNotAcquired
+
+logger, err_log = get_my_loggers()
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[], Awaitable | object]
+    interval: datetime.timedelta | None = None  # Запуск каждые interval
+    at: datetime.time | None = None  # Или ежедневно в это время
+    weekdays: frozenset[int] | None = None  # Дни недели для at, 0 - понедельник
+    jitter: float = 0  # Случайная задержка до jitter секунд
+    blocking: bool = False  # Синхронная функция, выполняется в потоке
+    lock_timeout: float = 600  # Дольше блокировка в Redis не держится
+    last_run: datetime.datetime | None = None
+
+    def _next_daily(self, after: datetime.datetime) -> datetime.datetime:
+        candidate = datetime.datetime.combine(after.date(), self.at)
+        if candidate <= after:
+            candidate += datetime.timedelta(days=1)
+        while self.weekdays is not None and candidate.weekday() not in self.weekdays:
+            candidate += datetime.timedelta(days=1)
+        return candidate
+
+    def _planned(self, now: datetime.datetime) -> datetime.datetime:
+        """Запуск по расписанию после last_run. Задача без запусков должна выполниться сразу"""
+        if self.last_run is None:
+            return now
+        if self.interval is not None:
+            return self.last_run + self.interval
+        return self._next_daily(self.last_run)
+
+    def is_due(self, now: datetime.datetime) -> bool:
+        return self._planned(now) <= now
+
+    def next_run(self, now: datetime.datetime) -> datetime.datetime:
+        """
+        Следующий запуск после last_run.
+        Если он уже в прошлом (бот был выключен) - запуск сейчас, без jitter
+        """
+        planned = self._planned(now)
+        if planned <= now:
+            return now
+        if self.jitter:
+            planned += datetime.timedelta(seconds=random.uniform(0, self.jitter))
+        return planned
+
+
+class Scheduler:
+
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+        self._heap: list[tuple[datetime.datetime, int, str]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._running: set[asyncio.Task] = set()
+        self._started = False
+
+    def every(self, name: str, func, interval: datetime.timedelta, **kwargs) -> Job:
+        return self.add(Job(name=name, func=func, interval=interval, **kwargs))
+
+    def daily(self, name: str, func, at: str, **kwargs) -> Job:
+        """at - 'ЧЧ:ММ' по локальному времени"""
+        return self.add(Job(name=name, func=func, at=datetime.time.fromisoformat(at.zfill(5)), **kwargs))
+
+    def add(self, job: Job) -> Job:
+        self.jobs[job.name] = job
+        # До запуска цикла задача попадет в кучу после загрузки last_run
+        if self._started:
+            self._push(job)
+        return job
+
+    def _push(self, job: Job):
+        heapq.heappush(self._heap, (job.next_run(datetime.datetime.now()), next(self._counter), job.name))
+        self._wakeup.set()
+
+    async def _load_last_runs(self, *names: str) -> dict[str, datetime.datetime]:
+        q = select(JobRun.name, JobRun.last_run)
+        if names:
+            q = q.where(JobRun.name.in_(names))
+        async with AsyncSession() as session:
+            return dict((await session.execute(q)).all())
+
+    async def _save_last_run(self, job: Job):
+        async with AsyncSession() as session:
+            q = (insert(JobRun).values(name=job.name, last_run=job.last_run)
+                 .on_conflict_do_update(index_elements=[JobRun.name], set_={'last_run': job.last_run}))
+            await session.execute(q)
+            await session.commit()
+
+    async def _execute(self, job: Job):
+        started = datetime.datetime.now()
+        try:
+            async with distributed_lock(f'job:{job.name}', timeout=job.lock_timeout, wait=0):
+                # Другой процесс мог уже выполнить этот запуск и отпустить блокировку
+                persisted = (await self._load_last_runs(job.name)).get(job.name)
+                if persisted and (job.last_run is None or persisted > job.last_run):
+                    job.last_run = persisted
+                    logger.debug(f'Задача {job.name} уже выполнена другим процессом')
+                    return
+                logger.info(f'Задача {job.name} запущена')
+                if job.blocking:
+                    await asyncio.to_thread(job.func)
+                else:
+                    await job.func()
+                job.last_run = started
+                await self._save_last_run(job)
+                logger.info(f'Задача {job.name} выполнена за {datetime.datetime.now() - started}')
+        except LockNotAcquired:
+            # Выполняет другой процесс, он же запишет last_run
+            job.last_run = started
+            logger.debug(f'Задачу {job.name} выполняет другой процесс')
+        except Exception as err:
+            err_log.error(f'Задача {job.name} завершилась ошибкой: {err}')
+            job.last_run = started
+        finally:
+            self._push(job)
+
+    async def run(self):
+        """Основной цикл, запускается фоновой задачей"""
+        try:
+            last_runs = await self._load_last_runs()
+            for job in self.jobs.values():
+                job.last_run = last_runs.get(job.name)
+        except Exception as err:
+            err_log.error(f'Не загружено время запусков, считаем задачи новыми: {err}')
+        # Пропущенные запуски - по очереди в порядке регистрации, затем обычный цикл
+        for job in list(self.jobs.values()):
+            if job.is_due(datetime.datetime.now()):
+                await self._execute(job)
+            else:
+                self._push(job)
+        self._started = True
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            when, _, name = self._heap[0]
+            delay = (when - datetime.datetime.now()).total_seconds()
+            if delay > 0:
+                try:
+                    # Новая задача может оказаться раньше текущей ближайшей
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            task = asyncio.create_task(self._execute(self.jobs[name]))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+
+scheduler = Scheduler()
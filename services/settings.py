@@ -0,0 +1,95 @@
+import asyncio
+import datetime
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import select
+
+from config_data.bot_conf import conf, get_my_loggers
+from database.db import AsyncSession, BotSettings
+from services.cache_bus import on_invalidate
+
+logger, err_log = get_my_loggers()
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """Типизированный срез настроек из bot_settings"""
+    tax1: int
+    tax2: int
+    manager_id: str
+    pay_req: str
+    cny_currency: float
+    currency_last_update: datetime.datetime
+
+    @classmethod
+    def from_values(cls, values: dict[str, str]) -> 'SettingsSnapshot':
+        return cls(
+            tax1=int(values['tax1']),
+            tax2=int(values['tax2']),
+            manager_id=values['manager_id'],
+            pay_req=values['pay_req'],
+            cny_currency=float(values['cny_currency']),
+            currency_last_update=datetime.datetime.fromisoformat(values['currency_last_update']),
+        )
+
+
+class SettingsCache:
+    """
+    Кэш таблицы bot_settings в памяти процесса.
+    Все строки читаются одним запросом и живут ttl секунд.
+    Запись через save_bot_settings сразу обновляет кэш.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._values: dict[str, str] = {}
+        self._snapshot: SettingsSnapshot | None = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return bool(self._loaded_at) and time.monotonic() - self._loaded_at < self.ttl
+
+    async def load(self):
+        async with AsyncSession() as session:
+            q = select(BotSettings.name, BotSettings.value)
+            rows = (await session.execute(q)).all()
+        self._values = {name: value for name, value in rows}
+        self._snapshot = None
+        self._loaded_at = time.monotonic()
+        logger.debug(f'Настройки загружены: {len(self._values)}')
+
+    async def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            # Пока ждали блокировку, кэш мог обновить другой хендлер
+            if not self._is_fresh():
+                await self.load()
+
+    async def get(self, name: str) -> str | None:
+        await self._ensure_loaded()
+        return self._values.get(name)
+
+    async def snapshot(self) -> SettingsSnapshot:
+        await self._ensure_loaded()
+        if self._snapshot is None:
+            self._snapshot = SettingsSnapshot.from_values(self._values)
+        return self._snapshot
+
+    def set(self, name: str, value: str):
+        """Write-through после успешного коммита"""
+        self._values[name] = value
+        self._snapshot = None
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+
+settings_cache = SettingsCache(ttl=conf.logic.settings_ttl)
+
+
+@on_invalidate('settings')
+def _reset_settings(arg: str):
+    settings_cache.invalidate()
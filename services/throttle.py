@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+
+from config_data.bot_conf import get_my_loggers
+
+logger, err_log = get_my_loggers()
+
+# Приоритеты очереди: ответы пользователям идут раньше рассылок менеджеру
+PRIORITY_USER = 0
+PRIORITY_BULK = 1
+
+send_priority: ContextVar[int] = ContextVar('send_priority', default=PRIORITY_USER)
+
+
+# Лимит 1 сообщение/с на чат касается только новых сообщений:
+# удаление и редактирование идут лишь через общий лимит
+CHAT_LIMITED_METHODS = ('copyMessage', 'forwardMessage')
+
+
+def is_new_message(method: TelegramMethod) -> bool:
+    api_method = method.__api_method__
+    if api_method == 'sendChatAction':
+        return False
+    return api_method.startswith('send') or api_method in CHAT_LIMITED_METHODS
+
+
+@contextlib.contextmanager
+def bulk_priority():
+    """Отправки внутри блока пропускают вперед ответы пользователям"""
+    token = send_priority.set(PRIORITY_BULK)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до следующего токена, 0 - токен взят"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    @property
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """
+    Ограничитель исходящих запросов Bot API.
+    Общий лимит ~30 сообщений/сек, в личный чат 1/сек, в группу 20/мин.
+    Глобальная очередь с приоритетами, на RetryAfter запрос повторяется
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, group_rate: float = 20 / 60,
+                 max_retries: int = 3, max_chats: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._pump: asyncio.Task | None = None
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                self._chats = {key: val for key, val in self._chats.items() if not val.idle}
+            is_group = str(chat_id).startswith('-')
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, 3 if not is_group else 1)
+        return bucket
+
+    async def _pump_queue(self):
+        """Раздает глобальные токены ожидающим по приоритету"""
+        while self._queue:
+            delay = self.global_bucket.delay()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+        self._pump = None
+
+    async def _acquire(self, chat_id):
+        if chat_id is not None:
+            bucket = self._chat_bucket(chat_id)
+            while delay := bucket.delay():
+                await asyncio.sleep(delay)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (send_priority.get(), next(self._seq), future))
+        if self._pump is None:
+            self._pump = asyncio.create_task(self._pump_queue())
+        await future
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType],
+                       bot: Bot, method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None) if is_new_message(method) else None
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as err:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f'{type(method).__name__} {chat_id}: RetryAfter {err.retry_after}')
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).pause(err.retry_after)
+                else:
+                    self.global_bucket.pause(err.retry_after)
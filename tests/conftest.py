@@ -0,0 +1,99 @@
+"""
+Общие фикстуры тестов.
+Запуск: python -m pytest
+
+Переменные окружения ставятся до импорта config_data: load_dotenv их не перезаписывает.
+Тесты с базой работают с отдельной базой TEST_POSTGRES_DB (по умолчанию poison_test),
+сервер берется из DB_* / POSTGRES_* переменных. Если Postgres недоступен, они пропускаются.
+"""
+import asyncio
+import datetime
+import itertools
+import os
+
+import pytest
+
+os.environ.setdefault('BOT_TOKEN', '123456:TEST')
+os.environ.setdefault('ADMIN_IDS', '100')
+os.environ.setdefault('TIMEZONE', 'Europe/Moscow')
+os.environ.setdefault('DB_HOST', '127.0.0.1')
+os.environ.setdefault('DB_PORT', '5432')
+os.environ.setdefault('POSTGRES_USER', 'postgres')
+os.environ.setdefault('POSTGRES_PASSWORD', 'postgres')
+# Рабочую базу из .env тесты не трогают
+os.environ['POSTGRES_DB'] = os.getenv('TEST_POSTGRES_DB', 'poison_test')
+os.environ['REDIS_HOST'] = ''
+
+
+def run(coro):
+    """
+    Выполняет корутину в новом event loop.
+    Пул соединений привязан к loop, поэтому после каждого прогона движки закрываются
+    """
+    from database.db import dispose_engines
+
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await dispose_engines()
+
+    return asyncio.run(wrapper())
+
+
+@pytest.fixture(scope='session')
+def database():
+    """Схема из миграций и начальные данные, курс свежий - без запросов к ЦБ"""
+    from sqlalchemy import update
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import Session
+
+    from database.bootstrap import migrate, seed
+    from database.db import get_engine, BotSettings
+
+    try:
+        migrate()
+    except OperationalError as err:
+        pytest.skip(f'Postgres недоступен: {err}')
+    seed()
+    with Session(get_engine()) as session:
+        session.execute(update(BotSettings).where(BotSettings.name == 'currency_last_update')
+                        .values(value=str(datetime.datetime.now())))
+        session.commit()
+    yield get_engine()
+    get_engine().dispose()
+
+
+tg_ids = itertools.count(700_000_000)
+
+
+@pytest.fixture
+def make_cart(database):
+    """Пользователь с n заказами в корзине, после теста удаляется вместе с заказами"""
+    from sqlalchemy import select, delete
+    from sqlalchemy.orm import Session
+
+    from database.db import User, Item, Order
+
+    users = []
+
+    def factory(n: int):
+        with Session(database, expire_on_commit=False) as session:
+            user = User(tg_id=str(next(tg_ids)), username='test', fio='Иванов Иван', phone='+79990000000',
+                        address='Москва', is_newbie=1)
+            session.add(user)
+            session.flush()
+            item_id = session.scalars(select(Item.id).order_by(Item.id)).first()
+            session.add_all([
+                Order(user_id=user.id, item_id=item_id, status='temp', link=f'https://dw4.co/t/{num}',
+                      size='42', cost=100 + num, photo_file_id=f'photo_{num}', pay_confirm_file_id='pay')
+                for num in range(n)
+            ])
+            session.commit()
+        users.append(user)
+        return user
+
+    yield factory
+    with Session(database) as session:
+        session.execute(delete(User).where(User.id.in_([user.id for user in users])))
+        session.commit()
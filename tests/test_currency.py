@@ -0,0 +1,194 @@
+"""
+CurrencyFetcher против локальной заглушки ЦБ на aiohttp.web.
+Адрес заглушки передается через CURRENCY_URL, как в рабочем конфиге.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from config_data.bot_conf import load_config
+from services import currency
+from services.currency import CurrencyFetcher, CircuitOpenError
+
+
+class FakeCbr:
+    """daily_json.js: курс, задержка и код ответа задаются в тесте"""
+
+    def __init__(self):
+        self.rate = 12.34
+        self.status = 200
+        self.delay = 0.0
+        self.hits = 0
+        self.url = ''
+        self._runner: web.AppRunner | None = None
+
+    async def handler(self, request: web.Request) -> web.Response:
+        self.hits += 1
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status)
+        # Как у ЦБ: JSON с типом application/javascript
+        return web.json_response({'Valute': {'CNY': {'Value': self.rate}}}, content_type='application/javascript')
+
+    async def __aenter__(self) -> 'FakeCbr':
+        app = web.Application()
+        app.router.add_get('/daily_json.js', self.handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}/daily_json.js'
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    # Только часы выключателя: event loop продолжает идти по настоящему time.monotonic
+    monkeypatch.setattr(currency, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def make_fetcher(monkeypatch):
+    def factory(cbr: FakeCbr, **kwargs) -> CurrencyFetcher:
+        monkeypatch.setenv('CURRENCY_URL', cbr.url)
+        return CurrencyFetcher(url=load_config().logic.currency_url, **kwargs)
+    return factory
+
+
+def test_single_flight(make_fetcher):
+    async def scenario():
+        async with FakeCbr() as cbr:
+            cbr.delay = 0.1
+            fetcher = make_fetcher(cbr)
+            try:
+                rates = await asyncio.gather(*(fetcher.fetch() for _ in range(5)))
+                # Следующий вызов - уже новый запрос
+                cbr.rate = 13.0
+                rates.append(await fetcher.fetch())
+            finally:
+                await fetcher.close()
+            return rates, cbr.hits
+
+    rates, hits = asyncio.run(scenario())
+    assert rates == [12.34] * 5 + [13.0]
+    assert hits == 2
+
+
+def test_cancelled_waiter_keeps_shared_request(make_fetcher):
+    async def scenario():
+        async with FakeCbr() as cbr:
+            cbr.delay = 0.1
+            fetcher = make_fetcher(cbr)
+            try:
+                first = asyncio.create_task(fetcher.fetch())
+                second = asyncio.create_task(fetcher.fetch())
+                await asyncio.sleep(0.02)
+                first.cancel()
+                return await second, cbr.hits
+            finally:
+                await fetcher.close()
+
+    assert asyncio.run(scenario()) == (12.34, 1)
+
+
+def test_circuit_breaker_backoff(make_fetcher, clock):
+    async def scenario():
+        async with FakeCbr() as cbr:
+            cbr.status = 500
+            fetcher = make_fetcher(cbr, failure_threshold=2, backoff=60, max_backoff=100)
+            try:
+                for _ in range(2):
+                    with pytest.raises(aiohttp.ClientResponseError):
+                        await fetcher.fetch()
+                # Цепь разомкнута: запрос не отправляется
+                assert fetcher.is_open
+                with pytest.raises(CircuitOpenError):
+                    await fetcher.fetch()
+                assert cbr.hits == 2
+                assert fetcher._open_until - clock.now == 60
+
+                # Пауза прошла, источник все еще лежит - пауза вдвое, но не больше max_backoff
+                clock.now += 61
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await fetcher.fetch()
+                assert fetcher._open_until - clock.now == 100
+                assert cbr.hits == 3
+
+                # Источник поднялся: первый же успех замыкает цепь
+                clock.now += 101
+                cbr.status = 200
+                assert await fetcher.fetch() == 12.34
+                assert not fetcher.is_open
+                assert fetcher._failures == 0
+            finally:
+                await fetcher.close()
+
+    asyncio.run(scenario())
+
+
+def test_refresh_in_background(make_fetcher):
+    async def scenario():
+        async with FakeCbr() as cbr:
+            cbr.delay = 0.05
+            fetcher = make_fetcher(cbr)
+            saved = []
+
+            async def on_success(cny):
+                saved.append(cny)
+
+            try:
+                # Повторный вызов, пока обновление идет, ничего не делает
+                fetcher.refresh_in_background(on_success)
+                fetcher.refresh_in_background(on_success)
+                await fetcher._refresh
+                assert fetcher._refresh is None
+                return saved, cbr.hits
+            finally:
+                await fetcher.close()
+
+    assert asyncio.run(scenario()) == ([12.34], 1)
+
+
+def test_refresh_in_background_failures(make_fetcher, clock, caplog):
+    async def scenario():
+        async with FakeCbr() as cbr:
+            fetcher = make_fetcher(cbr, failure_threshold=1)
+
+            async def broken_save(cny):
+                raise RuntimeError('база недоступна')
+
+            try:
+                # Ошибка сохранения логируется, а не теряется в задаче
+                fetcher.refresh_in_background(broken_save)
+                await fetcher._refresh
+                assert 'получен, но не сохранен: база недоступна' in caplog.text
+
+                # Ошибка запроса размыкает цепь, фоновые обновления не запускаются
+                cbr.status = 503
+                fetcher.refresh_in_background(broken_save)
+                await fetcher._refresh
+                assert fetcher.is_open
+                fetcher.refresh_in_background(broken_save)
+                assert fetcher._refresh is None
+                return cbr.hits
+            finally:
+                await fetcher.close()
+
+    assert asyncio.run(scenario()) == 2
@@ -0,0 +1,14 @@
+from handlers import calc, echo, manager, orders, user_handlers
+from middlewares.handler_name import handler_name
+
+
+def test_handler_labels_are_unique():
+    labels = []
+    for module in (user_handlers, orders, manager, calc, echo):
+        for observer in (module.router.message, module.router.callback_query):
+            for handler in observer.handlers:
+                labels.append(handler_name({'handler': handler, 'event_router': module.router}))
+    assert len(labels) == len(set(labels))
+    # Два get_reply в manager: отмена и подтверждение
+    replies = [name for router, name in labels if router == 'manager' and name.startswith('get_reply:')]
+    assert len(replies) == 2
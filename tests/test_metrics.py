@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+from config_data.bot_conf import BASE_DIR
+from tests.conftest import run
+
+from middlewares.metrics import prepare_multiprocess_dir, metrics_handler
+
+WORKER = """
+from middlewares.metrics import UPDATES, HANDLER_LATENCY
+UPDATES.labels('message').inc()
+HANDLER_LATENCY.labels('orders', 'order_cost:99').observe(0.01)
+"""
+
+
+def test_metrics_summed_across_workers(tmp_path, monkeypatch):
+    stale = tmp_path / 'counter_1.db'
+    stale.write_bytes(b'')
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    assert prepare_multiprocess_dir() == str(tmp_path)
+    assert not stale.exists()
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', WORKER], cwd=BASE_DIR, env=os.environ, check=True)
+    body = run(metrics_handler(None)).body.decode()
+    assert 'bot_updates_total{type="message"} 2.0' in body
+    assert 'bot_handler_seconds_count{handler="order_cost:99",router="orders"} 2.0' in body
@@ -0,0 +1,87 @@
+import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from tests.conftest import run
+
+from database.db import Order
+from services.order_status import change_status, change_status_many, claim_payed, parse_order_ids, \
+    parse_bulk_filter
+
+
+@pytest.fixture
+def order(make_cart, database):
+    """Покупатель с одним заказом в корзине: (tg_id, id заказа)"""
+    user = make_cart(1)
+    with Session(database) as session:
+        order_id = session.scalars(select(Order.id).where(Order.user_id == user.id)).one()
+    return user.tg_id, order_id
+
+
+def test_change_status_returns_buyer(order):
+    tg_id, order_id = order
+    change = run(change_status(order_id, 'payed'))
+    assert (change.order_id, change.tg_id, change.status) == (order_id, tg_id, 'payed')
+    # Повторный переход не находит строку
+    assert run(change_status(order_id, 'payed')) is None
+    # buyed только из payed, отмена - из любого статуса
+    assert run(change_status(order_id, 'buyed')).status == 'buyed'
+    assert run(change_status(order_id, 'canceled')).tg_id == tg_id
+
+
+def test_change_status_checks_manager_message(order):
+    _, order_id = order
+    assert run(change_status(order_id, 'canceled', manager_msg_id=999)) is None
+
+
+def test_change_status_many(make_cart):
+    user = make_cart(3)
+    changes = run(change_status_many('canceled', Order.user_id == user.id))
+    assert len(changes) == 3
+    assert {change.tg_id for change in changes} == {user.tg_id}
+
+
+def test_claim_payed_once(make_cart, database):
+    user = make_cart(3)
+    with Session(database) as session:
+        order_ids = session.scalars(select(Order.id).where(Order.user_id == user.id)).all()
+    claimed = run(claim_payed(list(reversed(order_ids))))
+    assert [order.id for order in claimed] == sorted(order_ids)
+    assert {order.status for order in claimed} == {'payed'}
+    # Повторный чек: заказы уже оплачены, отправлять менеджеру нечего
+    assert run(claim_payed(order_ids)) == []
+
+
+@pytest.mark.parametrize('text, order_ids', [
+    ('12', [12]),
+    ('12,13,20-22', [12, 13, 20, 21, 22]),
+    (' 12, 13 , 7-7,', [12, 13, 7]),
+])
+def test_parse_order_ids(text, order_ids):
+    assert parse_order_ids(text) == order_ids
+
+
+@pytest.mark.parametrize('text', ['', ' , ', '5-3', '1-2000', 'abc', '1-x'])
+def test_parse_order_ids_invalid(text):
+    with pytest.raises(ValueError):
+        parse_order_ids(text)
+
+
+def test_parse_bulk_filter_ids():
+    [criterion] = parse_bulk_filter('12,20-21')
+    assert criterion.left.key == 'id'
+    assert criterion.right.value == [12, 20, 21]
+
+
+def test_parse_bulk_filter_status_before():
+    status, pay_date = parse_bulk_filter('payed before 2023-11-01')
+    assert (status.left.key, status.right.value) == ('status', 'payed')
+    assert (pay_date.left.key, pay_date.right.value) == ('pay_date', datetime.datetime(2023, 11, 1))
+    assert pay_date.operator.__name__ == 'lt'
+
+
+def test_parse_bulk_filter_bad_date():
+    with pytest.raises(ValueError):
+        parse_bulk_filter('payed before 2023-13-01')
@@ -0,0 +1,79 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+
+from services.pricing import PriceSnapshot, effective_rate, to_decimal, parse_price
+from services.settings import SettingsSnapshot
+
+
+def make_prices(cny=12.69, tax1=99, tax2=249, shipping=None, updated=None) -> PriceSnapshot:
+    settings = SettingsSnapshot(tax1=tax1, tax2=tax2, manager_id='100', pay_req='', cny_currency=cny,
+                                currency_last_update=updated or datetime.datetime.now())
+    return PriceSnapshot.build(settings, shipping or {1: 1390, 2: 590})
+
+
+@pytest.mark.parametrize('cny, rate', [
+    (12.69, '13.2'),
+    (12.6, '13.1'),  # Уже кратно 0.1 - без округления
+    (12.61, '13.2'),  # Вверх, даже на копейку
+    ('12.1', '12.6'),
+])
+def test_effective_rate(cny, rate):
+    assert effective_rate(cny) == Decimal(rate)
+
+
+def test_to_decimal_keeps_float_digits():
+    assert to_decimal(0.1) == Decimal('0.1')
+    assert to_decimal(Decimal('1.50')) == Decimal('1.50')
+
+
+def test_price():
+    prices = make_prices()
+    # 100 * 13.2 * 1.01 + 1390 + 99
+    assert prices.price(100, 1, newbie=True) == Decimal('2822.20')
+    assert prices.price(100, 1, newbie=False) == Decimal('2972.20')
+    assert prices.price(100.5, 2, newbie=False) == Decimal('2178.87')
+
+
+def test_cart_total_rounds_once():
+    prices = make_prices(tax2=0, shipping={1: 0})
+    lines = [(0.5, 1)] * 3
+    # Каждая строка 6.666: по отдельности 6.67 * 3 = 20.01
+    assert sum(prices.price(cost, item_id, False) for cost, item_id in lines) == Decimal('20.01')
+    assert prices.cart_total(lines, newbie=False) == Decimal('20.00')
+    assert prices.cart_total([], newbie=False) == Decimal('0.00')
+
+
+def test_price_table_matches_price():
+    prices = make_prices()
+    yuan = [99, 100.5, 1999]
+    table = prices.price_table(yuan)
+    assert set(table) == {1, 2}
+    for item_id, row in table.items():
+        assert row == [prices.price(cost, item_id, newbie=False) for cost in yuan]
+    assert prices.price_table(yuan, newbie=True)[1][0] == prices.price(99, 1, newbie=True)
+
+
+def test_snapshot_is_immutable():
+    prices = make_prices()
+    with pytest.raises(TypeError):
+        prices.shipping[1] = 0
+    with pytest.raises(AttributeError):
+        prices.rate = Decimal(1)
+
+
+def test_rate_is_stale():
+    assert not make_prices().rate_is_stale
+    assert make_prices(updated=datetime.datetime.now() - datetime.timedelta(days=2)).rate_is_stale
+
+
+@pytest.mark.parametrize('text, price', [('199', '199'), (' 199.5 ', '199.5'), ('199,5', '199.5')])
+def test_parse_price(text, price):
+    assert parse_price(text) == Decimal(price)
+
+
+@pytest.mark.parametrize('text', ['', 'abc', '1,5,0', '0', '-10', 'NaN', 'Infinity'])
+def test_parse_price_invalid(text):
+    with pytest.raises(ValueError):
+        parse_price(text)
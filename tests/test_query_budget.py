@@ -0,0 +1,108 @@
+"""
+Бюджет SQL-запросов горячих путей: корзина и отправка заказов менеджеру.
+Кэши настроек и каталога прогреваются заранее, считаются только запросы самого пути.
+"""
+import itertools
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from tests.conftest import run
+
+from database.db import Order, get_async_engine
+from database.query_stats import assert_max_queries
+from services.cart import load_cart, get_bucket_text
+from services.func import send_orders_to_manager, MEDIA_GROUP_SIZE
+from services.order_status import claim_payed
+from services.pricing import pricing
+
+
+class FakeBot:
+    """
+    Отвечает как Bot API: id сообщений по порядку, запросы сохраняются.
+    checked_out - занятые соединения пула во время каждого запроса
+    """
+
+    def __init__(self):
+        self.message_ids = itertools.count(1)
+        self.calls = []
+        self.checked_out = []
+
+    async def send_photo(self, chat_id, photo, caption=None):
+        self.calls.append(('send_photo', chat_id, [photo]))
+        self.checked_out.append(get_async_engine().pool.checkedout())
+        return SimpleNamespace(message_id=next(self.message_ids))
+
+    async def send_media_group(self, chat_id, media):
+        self.calls.append(('send_media_group', chat_id, [item.media for item in media]))
+        self.checked_out.append(get_async_engine().pool.checkedout())
+        return [SimpleNamespace(message_id=next(self.message_ids)) for _ in media]
+
+
+def test_load_cart_single_query(make_cart):
+    user = make_cart(3)
+
+    async def scenario():
+        await pricing.snapshot()
+        with assert_max_queries(1):
+            cart = await load_cart(user)
+            text = cart.text()
+        with assert_max_queries(1):
+            assert await get_bucket_text(user) == text
+        return cart, text
+
+    cart, text = run(scenario())
+    assert [order.cost for order in cart.orders] == [100, 101, 102]
+    assert f'Итоговая стоимость: {cart.total_cost}' in text
+    for order in cart.orders:
+        assert f'Номер: {order.id}' in text
+
+
+def test_empty_cart_single_query(make_cart):
+    user = make_cart(0)
+
+    async def scenario():
+        await pricing.snapshot()
+        with assert_max_queries(1):
+            return await get_bucket_text(user)
+
+    assert run(scenario()) == 'Ваша корзина пуста'
+
+
+def test_send_orders_to_manager_queries(make_cart, database):
+    # Два альбома: 10 фото и 2 фото + чек
+    user = make_cart(MEDIA_GROUP_SIZE + 2)
+    bot = FakeBot()
+
+    async def scenario():
+        await pricing.snapshot()
+        cart = await load_cart(user)
+        with assert_max_queries(1):
+            orders = await claim_payed([order.id for order in cart.orders])
+        with assert_max_queries(1):
+            await send_orders_to_manager(user, bot, orders)
+
+    run(scenario())
+    assert [(name, len(media)) for name, _, media in bot.calls] == [('send_media_group', 10),
+                                                                    ('send_media_group', 3)]
+    assert bot.calls[-1][2][-1] == 'pay'
+    # Отправка идет без открытой транзакции
+    assert bot.checked_out == [0, 0]
+    with Session(database) as session:
+        rows = session.execute(select(Order.status, Order.manager_msg_id)
+                               .where(Order.user_id == user.id).order_by(Order.id)).all()
+    # Сообщение с чеком (id 13) ни к одному заказу не привязано
+    assert rows == [('payed', msg_id) for msg_id in range(1, 13)]
+
+
+def test_assert_max_queries_reports_statements(make_cart):
+    user = make_cart(1)
+
+    async def scenario():
+        with assert_max_queries(0):
+            await load_cart(user)
+
+    with pytest.raises(AssertionError, match='FROM orders'):
+        run(scenario())
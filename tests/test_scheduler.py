@@ -0,0 +1,114 @@
+import asyncio
+import datetime
+import uuid
+
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+
+from tests.conftest import run
+
+from database.db import JobRun
+from services import scheduler as scheduler_module
+from services.scheduler import Job, Scheduler
+
+# Воскресенье
+NOW = datetime.datetime(2026, 10, 18, 9, 0)
+
+
+async def noop():
+    pass
+
+
+def daily(at: str, last_run=None, **kwargs) -> Job:
+    return Job(name='daily', func=noop, at=datetime.time.fromisoformat(at), last_run=last_run, **kwargs)
+
+
+def test_never_run_job_is_due_now():
+    job = Job(name='new', func=noop, interval=datetime.timedelta(hours=1), jitter=60)
+    assert job.is_due(NOW)
+    assert job.next_run(NOW) == NOW
+    assert daily('05:00').next_run(NOW) == NOW
+
+
+def test_interval():
+    job = Job(name='every', func=noop, interval=datetime.timedelta(hours=1),
+              last_run=NOW - datetime.timedelta(minutes=30))
+    assert not job.is_due(NOW)
+    assert job.next_run(NOW) == NOW + datetime.timedelta(minutes=30)
+    job.last_run = NOW - datetime.timedelta(hours=2)
+    assert job.is_due(NOW)
+    assert job.next_run(NOW) == NOW
+
+
+def test_daily_next_run():
+    # Сегодняшний запуск еще впереди
+    job = daily('10:00', last_run=datetime.datetime(2026, 10, 17, 10, 0, 5))
+    assert not job.is_due(NOW)
+    assert job.next_run(NOW) == datetime.datetime(2026, 10, 18, 10, 0)
+    # Сегодня уже выполнена - завтра
+    job = daily('05:00', last_run=datetime.datetime(2026, 10, 18, 5, 0, 30))
+    assert not job.is_due(NOW)
+    assert job.next_run(NOW) == datetime.datetime(2026, 10, 19, 5, 0)
+
+
+def test_daily_catch_up_without_jitter():
+    # Бот был выключен в 05:00 - запуск сразу, без случайной задержки
+    job = daily('05:00', last_run=datetime.datetime(2026, 10, 17, 5, 0, 10), jitter=300)
+    assert job.is_due(NOW)
+    assert job.next_run(NOW) == NOW
+
+
+def test_jitter_only_delays_future_runs(monkeypatch):
+    monkeypatch.setattr(scheduler_module.random, 'uniform', lambda low, high: high)
+    job = daily('10:00', last_run=datetime.datetime(2026, 10, 17, 10, 0, 5), jitter=60)
+    assert job.next_run(NOW) == datetime.datetime(2026, 10, 18, 10, 1)
+
+
+def test_weekdays():
+    # Только по понедельникам: после понедельника 12.10 следующий - 19.10
+    job = daily('10:00', last_run=datetime.datetime(2026, 10, 12, 10, 0), weekdays=frozenset({0}))
+    assert not job.is_due(NOW)
+    assert job.next_run(NOW) == datetime.datetime(2026, 10, 19, 10, 0)
+    # Пропущенный понедельник выполняется сразу
+    job.last_run = datetime.datetime(2026, 10, 5, 10, 0)
+    assert job.is_due(NOW)
+
+
+def test_run_executes_missed_jobs_in_registration_order(database):
+    names = [f'test_{uuid.uuid4().hex[:8]}_{num}' for num in range(3)]
+    executed = []
+
+    def make_func(name):
+        async def func():
+            executed.append(name)
+        return func
+
+    async def scenario():
+        scheduler = Scheduler()
+        scheduler.every(names[0], make_func(names[0]), interval=datetime.timedelta(hours=1))
+        scheduler.daily(names[1], make_func(names[1]), at='00:00', jitter=300)
+        scheduler.every(names[2], make_func(names[2]), interval=datetime.timedelta(minutes=1))
+        task = asyncio.create_task(scheduler.run())
+
+        async def wait_executed():
+            while len(executed) < len(names):
+                await asyncio.sleep(0.05)
+
+        try:
+            await asyncio.wait_for(wait_executed(), timeout=10)
+        finally:
+            task.cancel()
+        # Выполненные задачи ждут следующего запуска в куче
+        return sorted(name for _, _, name in scheduler._heap)
+
+    try:
+        heap = run(scenario())
+        with Session(database) as session:
+            saved = session.scalars(select(JobRun.name).where(JobRun.name.in_(names))).all()
+    finally:
+        with Session(database) as session:
+            session.execute(delete(JobRun).where(JobRun.name.in_(names)))
+            session.commit()
+    assert executed == names
+    assert heap == sorted(names)
+    assert sorted(saved) == sorted(names)
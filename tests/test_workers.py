@@ -0,0 +1,29 @@
+import dataclasses
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    def configure(mode='webhook', workers=4, redis=object()):
+        monkeypatch.setattr(main.conf, 'webhook', dataclasses.replace(main.conf.webhook, mode=mode, workers=workers))
+        monkeypatch.setattr(main, 'redis', redis)
+    return configure
+
+
+def test_webhook_workers_with_redis(webhook):
+    webhook()
+    assert main.resolve_workers() == 4
+
+
+def test_single_worker_without_redis(webhook):
+    # FSM в памяти процесса: апдейт пользователя может попасть в другой воркер
+    webhook(redis=None)
+    assert main.resolve_workers() == 1
+
+
+def test_polling_single_worker(webhook):
+    webhook(mode='polling')
+    assert main.resolve_workers() == 1